@@ -1,7 +1,16 @@
 import yaml
+from core.config.models.channel_sets import ChannelSetsConfig
+from core.config.models.clustering import ClusteringConfig
+from core.config.models.compute_pool import ComputePoolConfig
+from core.config.models.content_cache import ContentCacheConfig
 from core.config.models.daily_post_handler import DailyPostHandlerConfig
 from core.config.models.database import DatabaseConfig
+from core.config.models.embedder import EmbedderConfig
 from core.config.models.loggers import LoggersConfig
+from core.config.models.near_duplicates import NearDuplicatesConfig
+from core.config.models.reduction import ReductionConfig
+from core.config.models.refresh_scheduler import RefreshSchedulerConfig
+from core.config.models.summarizer import SummarizerConfig
 from core.config.models.telethon import TelethonConfig
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -17,6 +26,15 @@ class Config(BaseSettings):
     loggers: LoggersConfig
     telethon: TelethonConfig
     daily_post_handler: DailyPostHandlerConfig
+    summarizer: SummarizerConfig
+    embedder: EmbedderConfig
+    content_cache: ContentCacheConfig
+    near_duplicates: NearDuplicatesConfig
+    refresh_scheduler: RefreshSchedulerConfig
+    clustering: ClusteringConfig
+    compute_pool: ComputePoolConfig
+    channel_sets: ChannelSetsConfig
+    reduction: ReductionConfig
 
 
 def load_yaml_config(file_path: str):
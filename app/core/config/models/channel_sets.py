@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ChannelSetsConfig(BaseModel):
+    # Оценки важности для каждого набора каналов пользователей, а не только по общему пулу постов
+    enabled: bool = True
+    # Сколько лучших постов хранится для набора каналов
+    top_posts: int = 200
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+
+
+class ClusteringConfig(BaseModel):
+    # "agglomerative" — точная кластеризация scikit-learn (O(n²) памяти),
+    # "knn_graph" — средняя связь по графу ближайших соседей из faiss
+    backend: str = "knn_graph"
+    # Косинусное расстояние средней связи, до которого кластеры объединяются
+    distance_threshold: float = 0.11
+    # Сколько ближайших соседей каждого поста попадает в граф
+    knn_neighbors: int = 30
+    # До этого числа постов соседи ищутся точным перебором, дальше — по HNSW
+    exact_search_max_posts: int = 20000
+    # Инкрементальный режим: новые посты добавляются к кластерам прошлого запуска,
+    # перекластеризуются только кластеры рядом с ними
+    incremental: bool = True
+    # Раз в столько дней кластеры строятся заново по всем постам; 0 — в каждый запуск
+    full_rebuild_interval_days: int = 7
+    # Если новых постов больше этой доли, кластеры тоже строятся заново
+    max_new_fraction: float = 0.5
+    # Запас к порогу: кластер перекластеризуется, если средняя связь с новым постом меньше порога плюс запас
+    affected_margin: float = 0.05
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 64
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ComputePoolConfig(BaseModel):
+    # Выключено — кластеризация и построение индекса идут в потоке того же процесса
+    enabled: bool = True
+    # Число процессов для CPU-тяжёлых стадий ежедневного запуска
+    max_workers: int = 1
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ContentCacheConfig(BaseModel):
+    enabled: bool = True
+    # Версия моделей суммаризации и эмбеддинга; при её смене старые записи перестают использоваться
+    model_version: str = "GigaChat/Embeddings"
+    max_size_mb: int = 1024
@@ -1,5 +1,52 @@
 from pydantic import BaseModel
 
 
+class FloodWaitConfig(BaseModel):
+    # Сколько раз повторяем обработку канала после FloodWaitError
+    max_retries: int = 3
+    # Если Telegram просит ждать дольше — канал пропускается до следующего запуска
+    max_wait_seconds: int = 900
+    # Запас поверх e.seconds, чтобы не попасть в лимит повторно
+    extra_delay_seconds: int = 1
+
+
+class IngestionPipelineConfig(BaseModel):
+    # Максимальный размер каждой очереди между стадиями
+    queue_size: int = 200
+    summarize_workers: int = 4
+    summarize_batch_size: int = 10
+    embed_workers: int = 2
+    embed_batch_size: int = 64
+    write_batch_size: int = 500
+    # Сколько стадия ждёт, чтобы добрать пачку, прежде чем обработать неполную
+    batch_linger_seconds: float = 0.5
+    # Как часто в лог пишется глубина очередей
+    monitor_interval_seconds: int = 30
+
+
+class WorkQueueConfig(BaseModel):
+    # Сколько каналов воркер забирает из очереди за раз
+    claim_batch_size: int = 10
+    # Через сколько секунд без heartbeat канал или этап запуска считается брошенным и забирается другим воркером
+    lease_seconds: int = 900
+    heartbeat_seconds: int = 60
+    # Как часто воркер без работы проверяет, закончили ли остальные
+    poll_seconds: int = 15
+
+
 class DailyPostHandlerConfig(BaseModel):
     days_to_keep: int
+    # Ширина секции таблицы posts в днях и на сколько дней вперёд секции создаются заранее
+    partition_days: int = 1
+    partitions_ahead_days: int = 3
+    max_concurrent_channels: int = 5
+    # Реакции и комментарии обновляются только у постов моложе этого окна
+    engagement_hot_days: int = 3
+    # Число подписчиков канала перезапрашивается из Telegram не чаще раза в этот период
+    subscribers_ttl_hours: int = 72
+    # Запуск, начатый не раньше этого окна, продолжается после рестарта (или считается выполненным),
+    # а не начинается заново
+    resume_window_hours: int = 20
+    flood_wait: FloodWaitConfig = FloodWaitConfig()
+    pipeline: IngestionPipelineConfig = IngestionPipelineConfig()
+    work_queue: WorkQueueConfig = WorkQueueConfig()
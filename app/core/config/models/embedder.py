@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class EmbedderConfig(BaseModel):
+    # Сколько текстов отправляется в одном запросе к GigaChat Embeddings
+    batch_size: int = 64
+    # Тексты обрезаются до этой длины перед эмбеддингом
+    max_text_chars: int = 512
+    # Сколько запросов к GigaChat Embeddings выполняется одновременно
+    max_concurrency: int = 2
+    max_retries: int = 3
+    retry_delay_seconds: float = 2.0
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+
+class NearDuplicatesConfig(BaseModel):
+    enabled: bool = True
+    # Максимальное расстояние Хэмминга между 64-битными SimHash, при котором пост — кандидат в дубли
+    max_hamming_distance: int = 12
+    # Сколько ближайших кандидатов проверяется по тексту
+    max_candidates: int = 5
+    # Минимальное сходство Жаккара по шинглам, которым подтверждается совпадение SimHash
+    min_jaccard: float = 0.7
+    # Размер шингла в словах
+    shingle_size: int = 2
+    # За сколько последних дней посты участвуют в поиске дублей
+    window_days: int = 7
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+
+class ReductionConfig(BaseModel):
+    # Понижение размерности эмбеддингов перед кластеризацией
+    enabled: bool = False
+    # "pca" — проекция на главные компоненты (без центрирования, чтобы сохранялись скалярные произведения),
+    # "random" — случайная гауссова проекция
+    method: str = "pca"
+    dim: int = 256
+    # Сколько эмбеддингов используется для подбора проекции
+    fit_sample: int = 20000
+    seed: int = 0
+    # Полнота поиска по сжатым векторам (recall@k) проверяется на таком числе запросов
+    recall_k: int = 10
+    recall_queries: int = 200
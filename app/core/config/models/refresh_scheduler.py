@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+
+class RefreshSchedulerConfig(BaseModel):
+    # Выключено — все каналы обновляются раз в сутки ежедневным запуском, как раньше
+    enabled: bool = True
+    # Как часто запускается обновление каналов, у которых подошло время
+    tick_minutes: int = 15
+    # Час ежедневного запуска с агрегацией и перестроением индекса
+    aggregation_hour: int = 0
+    # Сколько новых сообщений в среднем должно набираться к каждому обновлению канала
+    target_posts_per_refresh: float = 10.0
+    # Вес нового наблюдения в экспоненциальном скользящем среднем частоты постов
+    ema_alpha: float = 0.3
+    min_interval_minutes: int = 30
+    # Наибольший интервал для канала в зависимости от самой частой рассылки среди его подписчиков
+    max_interval_hours_weekly: int = 24
+    max_interval_hours_monthly: int = 72
+    # Случайный разброс интервала (доля), чтобы обновления каналов расходились по суткам
+    jitter: float = 0.1
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class SummarizerConfig(BaseModel):
+    # Сколько постов упаковывается в один запрос к GigaChat
+    batch_size: int = 10
+    # Ограничение на суммарную длину постов в одном запросе
+    max_batch_chars: int = 12000
+    # Сколько запросов к GigaChat выполняется одновременно
+    max_concurrency: int = 4
@@ -1,8 +1,35 @@
+from typing import List
+
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
 
+class TelethonSessionConfig(BaseModel):
+    session_name: str
+    api_id: str
+    api_hash: str
+    phone_number: str
+
+
 class TelethonConfig(BaseSettings):
     api_id: str
     api_hash: str
     session_name: str
     phone_number: str
+
+    # Дополнительные аккаунты пула в виде JSON-списка в TELETHON_SESSIONS.
+    # Если список пуст, используется единственная сессия из полей выше
+    telethon_sessions: List[TelethonSessionConfig] = []
+
+    @property
+    def sessions(self) -> List[TelethonSessionConfig]:
+        if self.telethon_sessions:
+            return self.telethon_sessions
+        return [
+            TelethonSessionConfig(
+                session_name=self.session_name,
+                api_id=self.api_id,
+                api_hash=self.api_hash,
+                phone_number=self.phone_number,
+            )
+        ]
@@ -1,14 +1,112 @@
-from typing import List
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from models.aggregated_posts import AggregatedPost
+from models.channel_set_post import ChannelSetPost
 from models.post import Post
-from sqlalchemy import text
+from sqlalchemy import Row, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+# Счётчик меток кластеров: метка исчезнувшего кластера не достаётся новому сюжету
+CLUSTER_LABEL_SEQUENCE = "cluster_label_seq"
 
-async def clear_aggregated_posts(db: AsyncSession) -> None:
-    await db.execute(text("DELETE FROM aggregated_posts"))
+
+async def replace_aggregated_posts(db: AsyncSession, rows: List[Tuple[str, float, str]]) -> int:
+    """
+    Заменяет содержимое aggregated_posts новым поколением строк (post_link, importance_score, cluster_label).
+    Читатели видят либо целиком старое, либо целиком новое поколение.
+    """
+    return await _replace_table(db, "aggregated_posts", ["post_link", "importance_score", "cluster_label"], rows)
+
+
+async def replace_channel_set_posts(db: AsyncSession, rows: List[Tuple[str, str, float, str]]) -> int:
+    """
+    Заменяет оценки всех наборов каналов строками (channel_set, post_link, importance_score, cluster_label).
+    """
+    return await _replace_table(
+        db, "channel_set_posts", ["channel_set", "post_link", "importance_score", "cluster_label"], rows
+    )
+
+
+async def get_channel_set_posts(
+    db: AsyncSession, channel_links: List[str], post_links: Optional[List[str]] = None, limit: int = 50
+) -> List[Row]:
+    """
+    Лучшие посты набора каналов: (post_link, importance_score, cluster_label) по убыванию оценки,
+    при заданном post_links — только среди этих постов.
+    Если оценок набора нет (набор появился после последней агрегации), посты берутся из общего пула
+    с фильтром по каналам.
+    """
+    query = (
+        select(ChannelSetPost.post_link, ChannelSetPost.importance_score, ChannelSetPost.cluster_label)
+        .where(ChannelSetPost.channel_set == channel_set_fingerprint(channel_links))
+        .order_by(ChannelSetPost.importance_score.desc())
+        .limit(limit)
+    )
+    if post_links is not None:
+        query = query.where(ChannelSetPost.post_link.in_(post_links))
+    rows = (await db.execute(query)).all()
+    if rows:
+        return rows
+
+    # post_link уникален только вместе с published_at: полусоединение не размножает строки aggregated_posts
+    channel_posts = select(Post.post_link).where(Post.channel_link.in_(channel_links))
+    query = (
+        select(AggregatedPost.post_link, AggregatedPost.importance_score, AggregatedPost.cluster_label)
+        .where(AggregatedPost.post_link.in_(channel_posts))
+        .order_by(AggregatedPost.importance_score.desc())
+        .limit(limit)
+    )
+    if post_links is not None:
+        query = query.where(AggregatedPost.post_link.in_(post_links))
+    return (await db.execute(query)).all()
+
+
+def channel_set_fingerprint(channel_links: Iterable[str]) -> str:
+    # Не зависит от порядка и повторов каналов
+    return hashlib.sha256("\n".join(sorted(set(channel_links))).encode()).hexdigest()
+
+
+async def _replace_table(db: AsyncSession, table: str, columns: List[str], rows: List[Tuple]) -> int:
+    """
+    Строки загружаются через COPY в отдельную таблицу, затем таблицы меняются местами в одной транзакции.
+    """
+    staging = f"{table}_staging"
+    await db.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    await db.execute(text(f"CREATE TABLE {staging} (LIKE {table} INCLUDING ALL)"))
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(staging, records=rows, columns=columns)
+    await db.commit()
+
+    # Переименования берут короткую эксклюзивную блокировку; индекс получает прежнее имя
+    await db.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+    await db.execute(text(f"ALTER TABLE {staging} RENAME TO {table}"))
+    await db.execute(text(f"DROP TABLE {table}_old"))
+    await db.execute(text(f"ALTER INDEX {staging}_pkey RENAME TO {table}_pkey"))
+    await db.commit()
+    return len(rows)
+
+
+async def get_cluster_labels(db: AsyncSession) -> Dict[str, str]:
+    # Метки кластеров прошлого запуска для инкрементальной кластеризации
+    result = await db.execute(select(AggregatedPost.post_link, AggregatedPost.cluster_label))
+    return dict(result.all())
+
+
+async def get_next_cluster_label(db: AsyncSession) -> int:
+    # Следующая ещё не выданная метка кластера
+    result = await db.execute(
+        text(f"SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM {CLUSTER_LABEL_SEQUENCE}")
+    )
+    return result.scalar_one()
+
+
+async def set_next_cluster_label(db: AsyncSession, next_label: int) -> None:
+    # setval с is_called = false: следующей выдаётся сама next_label
+    await db.execute(text(f"SELECT setval('{CLUSTER_LABEL_SEQUENCE}', :next_label, false)"), {"next_label": next_label})
     await db.commit()
 
 
@@ -1,7 +1,11 @@
-from typing import List
+from datetime import datetime, timezone
+from typing import Dict, List
 
 from models.channel import Channel
+from models.user import DigestFreq, User
 from models.user_channel import UserChannel
+from sqlalchemy import func, or_, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -12,11 +16,18 @@ async def get_channel(session: AsyncSession, channel_link: str) -> Channel | Non
     return result.scalars().first()  # Получаем первый результат или None
 
 
+async def get_channels(session: AsyncSession, channel_links: List[str]) -> List[Channel]:
+    if not channel_links:
+        return []
+    result = await session.execute(select(Channel).filter(Channel.channel_link.in_(channel_links)))
+    return result.scalars().all()
+
+
 async def create_channel(session: AsyncSession, channel_link: str, subs_cnt: int) -> Channel:
     # Проверяем, существует ли уже канал с данным channel_link
     channel = await get_channel(session, channel_link)
     if not channel:
-        channel = Channel(channel_link=channel_link, subs_cnt=subs_cnt)
+        channel = Channel(channel_link=channel_link, subs_cnt=subs_cnt, subs_updated_at=datetime.now(timezone.utc))
         session.add(channel)
         await session.commit()
         await session.refresh(channel)  # Обновляем объект после добавления
@@ -28,13 +39,91 @@ async def update_channel_subs_cnt(session: AsyncSession, channel_link: str, new_
     channel = await get_channel(session, channel_link)
     if channel:
         channel.subs_cnt = new_subs_cnt
+        channel.subs_updated_at = datetime.now(timezone.utc)
         await session.commit()
         await session.refresh(channel)  # Обновляем объект после изменения
     return channel
 
 
+async def update_channel_last_message(
+    session: AsyncSession, channel_link: str, message_id: int, message_date: datetime
+) -> Channel | None:
+    # Сдвигаем high-water mark канала только вперёд
+    channel = await get_channel(session, channel_link)
+    if channel and (channel.last_message_id is None or message_id > channel.last_message_id):
+        channel.last_message_id = message_id
+        channel.last_message_date = message_date
+        await session.commit()
+        await session.refresh(channel)
+    return channel
+
+
 async def get_all_channels_with_subscribers(session: AsyncSession) -> List[Channel]:
     # Получаем все каналы, на которые подписан хотя бы один пользователь
     query = select(Channel).join(UserChannel).filter(UserChannel.channel_link.isnot(None)).distinct()
     result = await session.execute(query)
     return result.scalars().all()  # Возвращаем все уникальные каналы
+
+
+async def get_channels_due_for_refresh(session: AsyncSession, now: datetime) -> List[Channel]:
+    # Каналы с подписчиками, у которых подошло время обновления или расписания ещё нет
+    query = (
+        select(Channel)
+        .join(UserChannel)
+        .filter(or_(Channel.next_refresh_at.is_(None), Channel.next_refresh_at <= now))
+        .distinct()
+    )
+    result = await session.execute(query)
+    return result.scalars().all()
+
+
+async def get_channels_digest_freq(session: AsyncSession, channel_links: List[str]) -> Dict[str, DigestFreq]:
+    """
+    Самая частая рассылка среди подписчиков каждого канала: WEEKLY, если хотя бы один подписчик получает
+    еженедельный дайджест, иначе MONTHLY.
+    """
+    if not channel_links:
+        return {}
+    query = (
+        select(UserChannel.channel_link, func.bool_or(User.digest_freq == DigestFreq.WEEKLY))
+        .join(User, User.user_id == UserChannel.user_id)
+        .filter(UserChannel.channel_link.in_(channel_links))
+        .group_by(UserChannel.channel_link)
+    )
+    result = await session.execute(query)
+    return {
+        channel_link: DigestFreq.WEEKLY if has_weekly else DigestFreq.MONTHLY for channel_link, has_weekly in result
+    }
+
+
+async def get_user_channel_sets(session: AsyncSession) -> Dict[str, List[str]]:
+    # Отсортированный список каналов каждого пользователя
+    query = select(
+        UserChannel.user_id, func.array_agg(aggregate_order_by(UserChannel.channel_link, UserChannel.channel_link))
+    ).group_by(UserChannel.user_id)
+    result = await session.execute(query)
+    return {user_id: channel_links for user_id, channel_links in result}
+
+
+async def get_user_channel_links(session: AsyncSession, user_id: str) -> List[str]:
+    result = await session.execute(select(UserChannel.channel_link).where(UserChannel.user_id == user_id))
+    return list(result.scalars().all())
+
+
+async def postpone_channel_refresh(session: AsyncSession, channel_links: List[str], until: datetime) -> None:
+    # Канал, поставленный в очередь запуска, не должен попасть в следующий запуск, пока не обработан
+    if not channel_links:
+        return
+    await session.execute(update(Channel).where(Channel.channel_link.in_(channel_links)).values(next_refresh_at=until))
+    await session.commit()
+
+
+async def update_channel_refresh_schedules(session: AsyncSession, schedules: List[Dict]) -> None:
+    """
+    Сохраняет расписание нескольких каналов одним executemany.
+    Каждый элемент — словарь с channel_link, posts_per_day, refreshed_at и next_refresh_at.
+    """
+    if not schedules:
+        return
+    await session.execute(update(Channel), schedules)
+    await session.commit()
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+from models.content_cache import ContentCacheEntry
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def get_cache_entries(
+    session: AsyncSession, content_hashes: Iterable[str], model_version: str
+) -> Dict[str, ContentCacheEntry]:
+    content_hashes = list(set(content_hashes))
+    if not content_hashes:
+        return {}
+
+    query = select(ContentCacheEntry).where(
+        ContentCacheEntry.model_version == model_version,
+        ContentCacheEntry.content_hash.in_(content_hashes),
+    )
+    result = await session.execute(query)
+    entries = {entry.content_hash: entry for entry in result.scalars().all()}
+
+    # Отмечаем использование найденных записей для вытеснения по давности
+    if entries:
+        await session.execute(
+            update(ContentCacheEntry)
+            .where(
+                ContentCacheEntry.model_version == model_version,
+                ContentCacheEntry.content_hash.in_(list(entries)),
+            )
+            .values(last_used_at=datetime.now(timezone.utc))
+        )
+        await session.commit()
+    return entries
+
+
+async def upsert_cache_titles(session: AsyncSession, titles: Dict[str, str], model_version: str) -> None:
+    await _upsert_cache_rows(
+        session,
+        [
+            {"content_hash": content_hash, "model_version": model_version, "title": title}
+            for content_hash, title in titles.items()
+        ],
+        update_columns=["title"],
+    )
+
+
+async def upsert_cache_embeddings(
+    session: AsyncSession, embeddings: Dict[str, List[float]], model_version: str
+) -> None:
+    await _upsert_cache_rows(
+        session,
+        [
+            {"content_hash": content_hash, "model_version": model_version, "embedding": embedding}
+            for content_hash, embedding in embeddings.items()
+        ],
+        update_columns=["embedding"],
+    )
+
+
+async def _upsert_cache_rows(session: AsyncSession, rows: List[Dict], update_columns: List[str]) -> None:
+    if not rows:
+        return
+
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        row["created_at"] = now
+        row["last_used_at"] = now
+        row["size_bytes"] = len((row.get("title") or "").encode()) + 8 * len(row.get("embedding") or [])
+
+    stmt = insert(ContentCacheEntry).values(rows)
+    # Заголовок и эмбеддинг приходят разными запросами, поэтому размер пересчитывается по итоговым значениям
+    title = stmt.excluded.title if "title" in update_columns else ContentCacheEntry.title
+    embedding = stmt.excluded.embedding if "embedding" in update_columns else ContentCacheEntry.embedding
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ContentCacheEntry.content_hash, ContentCacheEntry.model_version],
+        set_={
+            **{column: stmt.excluded[column] for column in update_columns},
+            "size_bytes": func.octet_length(func.coalesce(title, ""))
+            + 8 * func.coalesce(func.cardinality(embedding), 0),
+            "last_used_at": stmt.excluded.last_used_at,
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+
+
+async def evict_content_cache(session: AsyncSession, max_size_bytes: int) -> int:
+    """
+    Удаляет давно не использованные записи, пока суммарный размер кэша не уложится в max_size_bytes.
+    """
+    stmt = text(
+        """
+        DELETE FROM content_cache
+        WHERE (content_hash, model_version) IN (
+            SELECT content_hash, model_version FROM (
+                SELECT
+                    content_hash,
+                    model_version,
+                    SUM(size_bytes) OVER (ORDER BY last_used_at DESC, content_hash) AS cumulative_size
+                FROM content_cache
+            ) ranked
+            WHERE ranked.cumulative_size > :max_size_bytes
+        )
+        """
+    )
+    result = await session.execute(stmt, {"max_size_bytes": max_size_bytes})
+    await session.commit()
+    return result.rowcount
@@ -0,0 +1,184 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from models.daily_run import RUN_STAGES, DailyRun, DailyRunChannel
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Ключ advisory-лока, под которым воркеры создают запуск или присоединяются к нему
+DAILY_RUN_LOCK_KEY = 724_519_301
+
+
+async def get_or_create_daily_run(
+    session: AsyncSession, kind: str, since: datetime, resume_since: datetime
+) -> DailyRun:
+    """
+    Возвращает последний запуск вида kind: незавершённый, начатый не раньше resume_since,
+    или завершённый, начатый не раньше since. Иначе создаёт новый.
+    Окно resume_since относится только к незавершённым запускам; since для ежедневного запуска —
+    время его последнего срабатывания по расписанию.
+    Advisory-лок не даёт воркерам, стартовавшим одновременно, создать несколько запусков.
+    """
+    await session.execute(select(func.pg_advisory_xact_lock(DAILY_RUN_LOCK_KEY)))
+    query = (
+        select(DailyRun)
+        .where(
+            DailyRun.kind == kind,
+            or_(
+                and_(DailyRun.finished_at.is_(None), DailyRun.started_at >= resume_since),
+                and_(DailyRun.finished_at.isnot(None), DailyRun.started_at >= since),
+            ),
+        )
+        .order_by(DailyRun.started_at.desc())
+        .limit(1)
+    )
+    result = await session.execute(query)
+    run = result.scalars().first()
+    if run is None:
+        run = DailyRun(kind=kind, stage=RUN_STAGES[0])
+        session.add(run)
+    await session.commit()
+    await session.refresh(run)
+    return run
+
+
+async def get_daily_run(session: AsyncSession, run_id: int) -> DailyRun | None:
+    result = await session.execute(
+        select(DailyRun).where(DailyRun.id == run_id).execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+async def set_daily_run_stage(session: AsyncSession, run_id: int, worker_id: str, stage: str) -> None:
+    # Этап двигает только воркер, владеющий запуском
+    now = datetime.now(timezone.utc)
+    values = {"stage": stage, "updated_at": now}
+    if stage == RUN_STAGES[-1]:
+        values["finished_at"] = now
+    await session.execute(update(DailyRun).where(DailyRun.id == run_id, DailyRun.owner == worker_id).values(**values))
+    await session.commit()
+
+
+async def finish_ingest_stage(session: AsyncSession, run_id: int, worker_id: str) -> bool:
+    """
+    Переводит запуск из этапа загрузки в следующий, если в очереди не осталось каналов.
+    Условный UPDATE выполняется ровно у одного воркера — он и становится владельцем запуска.
+    """
+    unfinished = (
+        select(DailyRunChannel.channel_link)
+        .where(DailyRunChannel.run_id == run_id, DailyRunChannel.status.in_(("pending", "running")))
+        .exists()
+    )
+    stmt = (
+        update(DailyRun)
+        .where(DailyRun.id == run_id, DailyRun.stage == RUN_STAGES[0], ~unfinished)
+        .values(stage=RUN_STAGES[1], owner=worker_id, updated_at=datetime.now(timezone.utc))
+        .returning(DailyRun.id)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.scalar() is not None
+
+
+async def claim_daily_run(session: AsyncSession, run_id: int, worker_id: str, lease_seconds: int) -> str | None:
+    """
+    Забирает этапы после загрузки, если они ещё никому не принадлежат или их владелец перестал слать heartbeat.
+    Возвращает этап, с которого нужно продолжить, или None.
+    """
+    now = datetime.now(timezone.utc)
+    stmt = (
+        update(DailyRun)
+        .where(
+            DailyRun.id == run_id,
+            DailyRun.stage.notin_((RUN_STAGES[0], RUN_STAGES[-1])),
+            or_(
+                DailyRun.owner.is_(None),
+                DailyRun.owner == worker_id,
+                DailyRun.updated_at < now - timedelta(seconds=lease_seconds),
+            ),
+        )
+        .values(owner=worker_id, updated_at=now)
+        .returning(DailyRun.stage)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.scalar()
+
+
+async def add_daily_run_channels(session: AsyncSession, run_id: int, channel_links: List[str]) -> None:
+    # Каналы, уже записанные в запуск, сохраняют свой статус
+    if not channel_links:
+        return
+    stmt = insert(DailyRunChannel).values(
+        [{"run_id": run_id, "channel_link": channel_link, "status": "pending"} for channel_link in channel_links]
+    )
+    await session.execute(stmt.on_conflict_do_nothing())
+    await session.commit()
+
+
+async def claim_run_channels(
+    session: AsyncSession, run_id: int, worker_id: str, limit: int, lease_seconds: int
+) -> List[str]:
+    """
+    Забирает до limit каналов из очереди запуска: ещё не начатые и брошенные воркерами без heartbeat.
+    SKIP LOCKED позволяет воркерам забирать каналы одновременно, не блокируя друг друга.
+    """
+    now = datetime.now(timezone.utc)
+    claimable = (
+        select(DailyRunChannel.channel_link)
+        .where(
+            DailyRunChannel.run_id == run_id,
+            or_(
+                DailyRunChannel.status == "pending",
+                and_(
+                    DailyRunChannel.status == "running",
+                    DailyRunChannel.claimed_at < now - timedelta(seconds=lease_seconds),
+                ),
+            ),
+        )
+        .order_by(DailyRunChannel.channel_link)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(DailyRunChannel)
+        .where(DailyRunChannel.run_id == run_id, DailyRunChannel.channel_link.in_(claimable))
+        .values(status="running", claimed_by=worker_id, claimed_at=now, started_at=now, error=None)
+        .returning(DailyRunChannel.channel_link)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return list(result.scalars().all())
+
+
+async def touch_daily_run_claims(session: AsyncSession, run_id: int, worker_id: str) -> None:
+    # Heartbeat воркера: продлевает его каналы в работе и владение этапами запуска
+    now = datetime.now(timezone.utc)
+    await session.execute(
+        update(DailyRunChannel)
+        .where(
+            DailyRunChannel.run_id == run_id,
+            DailyRunChannel.claimed_by == worker_id,
+            DailyRunChannel.status == "running",
+        )
+        .values(claimed_at=now)
+    )
+    await session.execute(
+        update(DailyRun)
+        .where(DailyRun.id == run_id, DailyRun.owner == worker_id, DailyRun.finished_at.is_(None))
+        .values(updated_at=now)
+    )
+    await session.commit()
+
+
+async def set_run_channel_status(
+    session: AsyncSession, run_id: int, channel_link: str, status: str, error: str | None = None
+) -> None:
+    await session.execute(
+        update(DailyRunChannel)
+        .where(DailyRunChannel.run_id == run_id, DailyRunChannel.channel_link == channel_link)
+        .values(status=status, error=error, finished_at=datetime.now(timezone.utc))
+    )
+    await session.commit()
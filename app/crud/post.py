@@ -1,11 +1,21 @@
 # crud/crud_post.py
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from models.post import Post
-from sqlalchemy import delete, select, update
+import numpy as np
+from models.channel import Channel
+from models.post import EMBEDDING_DIM, Post
+from sqlalchemy import Integer, Row, Select, String, bindparam, case, column, func, select, text, update, values
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, undefer
+
+# Сколько строк с эмбеддингами читается из курсора за раз
+EMBEDDING_STREAM_CHUNK = 2000
+
+# Секции posts по published_at: posts_pYYYYMMDD_YYYYMMDD и секция по умолчанию для постов вне диапазонов
+POST_PARTITION_PREFIX = "posts_p"
+POST_DEFAULT_PARTITION = "posts_default"
 
 
 async def create_post(
@@ -18,6 +28,7 @@ async def create_post(
     amount_reactions: int = 0,
     amount_comments: int = 0,
     published_at: Optional[datetime] = None,
+    simhash: Optional[int] = None,
 ) -> Post:
     post = Post(
         post_link=post_link,
@@ -28,6 +39,7 @@ async def create_post(
         amount_reactions=amount_reactions,
         amount_comments=amount_comments,
         published_at=published_at,
+        simhash=simhash,
     )
     session.add(post)
     await session.commit()
@@ -35,16 +47,99 @@ async def create_post(
     return post
 
 
+async def upsert_posts(session: AsyncSession, rows: List[Dict], chunk_size: int = 1000) -> int:
+    """
+    Массово вставляет посты через INSERT ... ON CONFLICT (post_link, published_at) DO UPDATE.
+    Дата сообщения Telegram не меняется, поэтому пара (post_link, published_at) однозначно задаёт пост.
+    Все чанки пишутся в одной транзакции с одним коммитом в конце.
+    Для существующих постов title, embedding и simhash не затираются пустыми значениями.
+    """
+    if not rows:
+        return 0
+
+    for start in range(0, len(rows), chunk_size):
+        stmt = insert(Post).values(rows[start : start + chunk_size])
+        update_columns = {
+            column: func.coalesce(stmt.excluded[column], Post.__table__.c[column])
+            for column in ("title", "embedding", "simhash")
+            if column in rows[0]
+        }
+        update_columns.update(
+            {column: stmt.excluded[column] for column in ("amount_reactions", "amount_comments") if column in rows[0]}
+        )
+        conflict_columns = [Post.post_link, Post.published_at]
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_=update_columns)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+        await session.execute(stmt)
+
+    await session.commit()
+    return len(rows)
+
+
 async def get_post_by_link(session: AsyncSession, post_link: str):
-    result = await session.execute(select(Post).where(Post.post_link == post_link))
+    result = await session.execute(
+        select(Post).options(undefer(Post.text), undefer(Post.embedding)).where(Post.post_link == post_link)
+    )
     return result.scalar_one_or_none()
 
 
 async def get_all_posts(session: AsyncSession) -> List[Post]:
-    result = await session.execute(select(Post).options(selectinload(Post.channel)))
+    # Полные строки всех постов; в ежедневном запуске вместо неё используются проекции ниже
+    result = await session.execute(
+        select(Post).options(selectinload(Post.channel), undefer(Post.text), undefer(Post.embedding))
+    )
     return result.scalars().all()
 
 
+async def get_post_metrics(session: AsyncSession) -> List[Row]:
+    """
+    Метрики постов с эмбеддингом для агрегации: post_link, channel_link, amount_reactions, amount_comments,
+    published_at и subs_cnt канала. Текст и эмбеддинг не загружаются.
+    """
+    query = (
+        select(
+            Post.post_link,
+            Post.channel_link,
+            func.coalesce(Post.amount_reactions, 0).label("amount_reactions"),
+            func.coalesce(Post.amount_comments, 0).label("amount_comments"),
+            Post.published_at,
+            func.coalesce(Channel.subs_cnt, 0).label("subs_cnt"),
+        )
+        .join(Channel, Channel.channel_link == Post.channel_link)
+        .where(Post.embedding.isnot(None))
+    )
+    result = await session.execute(query)
+    return result.all()
+
+
+async def get_post_embeddings(session: AsyncSession) -> Tuple[List[str], np.ndarray]:
+    """
+    Ссылки постов и их эмбеддинги одной матрицей float32 (n x EMBEDDING_DIM).
+    """
+    query = select(Post.post_link, Post.embedding).where(Post.embedding.isnot(None)).order_by(Post.post_link)
+    return await _fetch_embedding_matrix(session, query)
+
+
+async def _fetch_embedding_matrix(session: AsyncSession, query: Select) -> Tuple[List, np.ndarray]:
+    """
+    Читает строки (ключ, эмбеддинг) курсором и складывает эмбеддинги сразу в заранее выделенную матрицу,
+    без промежуточных списков векторов.
+    """
+    expected = await session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    matrix = np.empty((expected, EMBEDDING_DIM), dtype=np.float32)
+    keys = []
+    result = await session.stream(query.execution_options(yield_per=EMBEDDING_STREAM_CHUNK))
+    async for key, embedding in result:
+        if len(keys) == len(matrix):
+            # Посты, добавленные между подсчётом и чтением
+            matrix = np.concatenate([matrix, np.empty((max(len(matrix) // 2, 1), EMBEDDING_DIM), dtype=np.float32)])
+        matrix[len(keys)] = embedding
+        keys.append(key)
+    return keys, matrix[: len(keys)]
+
+
 async def update_post(
     session: AsyncSession,
     post_link: str,
@@ -84,13 +179,96 @@ async def update_post(
     return updated_post
 
 
-async def delete_old_posts(session: AsyncSession, days_to_keep: int) -> int:
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_to_keep)
-    stmt = delete(Post).where(Post.published_at < cutoff_date)
-    result = await session.execute(stmt)
+async def ensure_post_partitions(session: AsyncSession, start: datetime, end: datetime, partition_days: int) -> int:
+    """
+    Создаёт недостающие секции posts шириной partition_days, покрывающие [start, end).
+    Посты этого диапазона, уже попавшие в posts_default, переносятся в новую секцию.
+    Возвращает число созданных секций.
+    """
+    existing = await _get_post_partitions(session)
+    created = 0
+    for lower, upper in _partition_ranges(start, end, partition_days):
+        if any(lower < other_upper and other_lower < upper for other_lower, other_upper in existing.values()):
+            continue
+        name = f"{POST_PARTITION_PREFIX}{lower:%Y%m%d}_{upper:%Y%m%d}"
+        bounds = {"lower": lower, "upper": upper}
+        await session.execute(text(f"CREATE TABLE {name} (LIKE posts INCLUDING DEFAULTS)"))
+        await session.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {POST_DEFAULT_PARTITION} "
+                "WHERE published_at >= :lower AND published_at < :upper RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+        await session.execute(
+            text(
+                f"ALTER TABLE posts ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        await session.commit()
+        existing[name] = (lower, upper)
+        created += 1
+    return created
+
+
+async def drop_post_partitions_before(session: AsyncSession, cutoff: datetime) -> int:
+    """
+    Удаляет секции posts, целиком лежащие раньше cutoff, — вместо DELETE по всей таблице.
+    Посты в секции, на которую приходится cutoff, доживают до удаления всей секции.
+    Возвращает число удалённых секций.
+    """
+    dropped = 0
+    for name, (_, upper) in (await _get_post_partitions(session)).items():
+        if upper > cutoff:
+            continue
+        await session.execute(text(f"ALTER TABLE posts DETACH PARTITION {name}"))
+        await session.execute(text(f"DROP TABLE {name}"))
+        await session.commit()
+        dropped += 1
+
+    # Старые посты, попавшие в секцию по умолчанию, и агрегаты удалённых постов — небольшие объёмы
+    await session.execute(
+        text(f"DELETE FROM {POST_DEFAULT_PARTITION} WHERE published_at < :cutoff"), {"cutoff": cutoff}
+    )
+    await session.execute(
+        text("DELETE FROM aggregated_posts a WHERE NOT EXISTS (SELECT 1 FROM posts p WHERE p.post_link = a.post_link)")
+    )
     await session.commit()
+    return dropped
+
+
+async def _get_post_partitions(session: AsyncSession) -> Dict[str, Tuple[datetime, datetime]]:
+    # Границы секции записаны в её имени: posts_pYYYYMMDD_YYYYMMDD
+    result = await session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'posts'::regclass"
+        )
+    )
+    partitions = {}
+    for (name,) in result.all():
+        if not name.startswith(POST_PARTITION_PREFIX):
+            continue
+        lower, upper = name[len(POST_PARTITION_PREFIX) :].split("_")
+        partitions[name] = (
+            datetime.strptime(lower, "%Y%m%d").replace(tzinfo=timezone.utc),
+            datetime.strptime(upper, "%Y%m%d").replace(tzinfo=timezone.utc),
+        )
+    return partitions
+
 
-    return result.rowcount
+def _partition_ranges(start: datetime, end: datetime, partition_days: int) -> List[Tuple[datetime, datetime]]:
+    # Секции выровнены по полуночи UTC и по partition_days от начала эпохи
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    lower = epoch + timedelta(days=(start - epoch).days // partition_days * partition_days)
+    ranges = []
+    while lower < end:
+        upper = lower + timedelta(days=partition_days)
+        ranges.append((lower, upper))
+        lower = upper
+    return ranges
 
 
 async def get_latest_post_by_channel(session: AsyncSession, channel_link: str) -> Post | None:
@@ -100,5 +278,126 @@ async def get_latest_post_by_channel(session: AsyncSession, channel_link: str) -
 
 
 async def get_posts_by_channel(session, channel_link) -> List[Post]:
-    result = await session.execute(select(Post).where(Post.channel_link == channel_link))
+    # Для проверки известных постов достаточно get_post_links_by_channel
+    result = await session.execute(
+        select(Post).options(undefer(Post.text), undefer(Post.embedding)).where(Post.channel_link == channel_link)
+    )
+    return result.scalars().all()
+
+
+async def get_posts_without_embedding(session: AsyncSession) -> List[Row]:
+    # Только то, что нужно для эмбеддинга: post_link, text, title
+    query = select(Post.post_link, Post.text, Post.title).where(Post.embedding.is_(None), Post.title.isnot(None))
+    result = await session.execute(query)
+    return result.all()
+
+
+async def set_post_embeddings(session: AsyncSession, embeddings: Dict[str, List[float]]) -> None:
+    """
+    Сохраняет эмбеддинги нескольких постов одним executemany и одним коммитом.
+    """
+    if not embeddings:
+        return
+    # Core UPDATE по post_link: первичный ключ секционированной таблицы включает ещё и published_at
+    posts = Post.__table__
+    stmt = update(posts).where(posts.c.post_link == bindparam("b_post_link")).values(embedding=bindparam("b_embedding"))
+    await session.execute(
+        stmt,
+        [{"b_post_link": post_link, "b_embedding": embedding} for post_link, embedding in embeddings.items()],
+    )
+    await session.commit()
+
+
+async def get_posts_by_links(session: AsyncSession, post_links: List[str]) -> List[Post]:
+    if not post_links:
+        return []
+    result = await session.execute(
+        select(Post).options(undefer(Post.text), undefer(Post.embedding)).where(Post.post_link.in_(post_links))
+    )
     return result.scalars().all()
+
+
+async def get_recent_simhashes(
+    session: AsyncSession, since: datetime
+) -> List[Tuple[str, Optional[int], Optional[str]]]:
+    """
+    Возвращает (post_link, simhash, text) постов с since.
+    Текст загружается только для постов, у которых SimHash ещё не посчитан.
+    """
+    query = select(Post.post_link, Post.simhash, case((Post.simhash.is_(None), Post.text))).where(
+        Post.published_at >= since
+    )
+    result = await session.execute(query)
+    return result.all()
+
+
+async def get_post_links_by_channel(
+    session: AsyncSession, channel_link: str, since: Optional[datetime] = None
+) -> List[str]:
+    query = select(Post.post_link).where(Post.channel_link == channel_link)
+    if since is not None:
+        query = query.where(Post.published_at >= since)
+    result = await session.execute(query)
+    return result.scalars().all()
+
+
+async def update_posts_engagement(
+    session: AsyncSession,
+    engagement: List[Tuple[str, int, int]],
+    since: Optional[datetime] = None,
+    chunk_size: int = 5000,
+) -> int:
+    """
+    Обновляет реакции и комментарии набора постов через UPDATE ... FROM (VALUES ...).
+    engagement — список (post_link, amount_reactions, amount_comments). Один коммит на вызов.
+    since — нижняя граница published_at этих постов: UPDATE затрагивает только нужные секции.
+    """
+    updated = 0
+    posts = Post.__table__
+    for start in range(0, len(engagement), chunk_size):
+        engagement_values = values(
+            column("post_link", String),
+            column("amount_reactions", Integer),
+            column("amount_comments", Integer),
+            name="engagement",
+        ).data(engagement[start : start + chunk_size])
+        stmt = update(posts).where(posts.c.post_link == engagement_values.c.post_link)
+        if since is not None:
+            stmt = stmt.where(posts.c.published_at >= since)
+        stmt = stmt.values(
+            amount_reactions=engagement_values.c.amount_reactions,
+            amount_comments=engagement_values.c.amount_comments,
+        )
+        result = await session.execute(stmt)
+        updated += result.rowcount
+
+    if engagement:
+        await session.commit()
+    return updated
+
+
+async def get_similar_posts(
+    session: AsyncSession,
+    embedding: List[float],
+    top_k: int = 10,
+    channel_links: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    ef_search: Optional[int] = None,
+) -> List[Tuple[Post, float]]:
+    """
+    Ближайшие к embedding посты по косинусному расстоянию (HNSW-индекс ix_posts_embedding_hnsw).
+    Фильтры по каналам и времени применяются к кандидатам индекса, поэтому при узких фильтрах
+    стоит увеличить ef_search (по умолчанию в pgvector — 40), чтобы получить полные top_k.
+    """
+    if ef_search is not None:
+        # SET LOCAL действует до конца текущей транзакции и не принимает bind-параметры
+        await session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+
+    distance = Post.embedding.cosine_distance(embedding).label("distance")
+    query = select(Post, distance).options(undefer(Post.text)).where(Post.embedding.isnot(None))
+    if channel_links is not None:
+        query = query.where(Post.channel_link.in_(channel_links))
+    if since is not None:
+        query = query.where(Post.published_at >= since)
+    result = await session.execute(query.order_by(distance).limit(top_k))
+    return [(post, float(post_distance)) for post, post_distance in result.all()]
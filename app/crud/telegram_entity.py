@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from models.telegram_entity import TelegramEntity
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def get_telegram_entity(session: AsyncSession, session_name: str, channel_link: str) -> TelegramEntity | None:
+    query = select(TelegramEntity).where(
+        TelegramEntity.session_name == session_name, TelegramEntity.channel_link == channel_link
+    )
+    result = await session.execute(query)
+    return result.scalars().first()
+
+
+async def save_telegram_entity(
+    session: AsyncSession, session_name: str, channel_link: str, tg_id: int, access_hash: int
+) -> None:
+    stmt = insert(TelegramEntity).values(
+        session_name=session_name,
+        channel_link=channel_link,
+        tg_id=tg_id,
+        access_hash=access_hash,
+        updated_at=datetime.now(timezone.utc),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TelegramEntity.session_name, TelegramEntity.channel_link],
+        set_={
+            "tg_id": stmt.excluded.tg_id,
+            "access_hash": stmt.excluded.access_hash,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+
+
+async def delete_telegram_entity(session: AsyncSession, session_name: str, channel_link: str) -> None:
+    await session.execute(
+        delete(TelegramEntity).where(
+            TelegramEntity.session_name == session_name, TelegramEntity.channel_link == channel_link
+        )
+    )
+    await session.commit()
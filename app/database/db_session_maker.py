@@ -3,6 +3,7 @@ from contextlib import asynccontextmanager
 
 from core.config import main_config
 from core.config.models.database import DatabaseConfig
+from database.migrations import apply_extensions, apply_migrations
 from models.base import Base
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
@@ -62,7 +63,9 @@ class AsyncDatabaseSession:
     async def create_all(self):
         try:
             async with self._engine.begin() as conn:
+                await apply_extensions(conn)
                 await conn.run_sync(Base.metadata.create_all)
+                await apply_migrations(conn)
             self.logger.debug("All tables created successfully.")
         except Exception as e:
             self.logger.error(f"Error creating tables: {e}", exc_info=True)
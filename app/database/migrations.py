@@ -0,0 +1,74 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Расширения, которые нужны уже при создании таблиц
+EXTENSIONS = [
+    "CREATE EXTENSION IF NOT EXISTS vector",
+]
+
+# Base.metadata.create_all не изменяет существующие таблицы, поэтому новые колонки
+# добавляются идемпотентными DDL-запросами. Новые миграции добавляются в конец списка.
+MIGRATIONS = [
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS last_message_id BIGINT",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS last_message_date TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS simhash BIGINT",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS subs_updated_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE daily_runs ADD COLUMN IF NOT EXISTS owner VARCHAR",
+    "ALTER TABLE daily_run_channels ADD COLUMN IF NOT EXISTS claimed_by VARCHAR",
+    "ALTER TABLE daily_run_channels ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_daily_run_channels_queue ON daily_run_channels (run_id, status)",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS posts_per_day DOUBLE PRECISION",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS next_refresh_at TIMESTAMP WITH TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_channels_next_refresh_at ON channels (next_refresh_at)",
+    "ALTER TABLE daily_runs ADD COLUMN IF NOT EXISTS kind VARCHAR NOT NULL DEFAULT 'daily'",
+    # Эмбеддинги постов: double precision[] → pgvector; таблица переписывается только один раз
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'posts' AND column_name = 'embedding' AND data_type = 'ARRAY'
+        ) THEN
+            ALTER TABLE posts ALTER COLUMN embedding TYPE vector(1024) USING embedding::vector(1024);
+        END IF;
+    END $$
+    """,
+    # HNSW-индекс создаётся после секционирования ниже, чтобы не строить его дважды по всей таблице
+    # Секционирование posts по published_at: обычная таблица пересоздаётся секционированной,
+    # все строки попадают в posts_default и разносятся по секциям в ensure_post_partitions
+    "ALTER TABLE aggregated_posts DROP CONSTRAINT IF EXISTS aggregated_posts_post_link_fkey",
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'posts' AND relkind = 'r') THEN
+            ALTER TABLE posts RENAME TO posts_unpartitioned;
+            ALTER TABLE posts_unpartitioned DROP CONSTRAINT IF EXISTS posts_pkey;
+            ALTER TABLE posts_unpartitioned DROP CONSTRAINT IF EXISTS posts_post_link_key;
+            DROP INDEX IF EXISTS ix_posts_embedding_hnsw;
+            CREATE TABLE posts (LIKE posts_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (published_at);
+            ALTER TABLE posts ADD CONSTRAINT posts_pkey PRIMARY KEY (post_link, published_at);
+            ALTER TABLE posts ADD CONSTRAINT posts_channel_link_fkey
+                FOREIGN KEY (channel_link) REFERENCES channels (channel_link);
+            CREATE TABLE posts_default PARTITION OF posts DEFAULT;
+            INSERT INTO posts SELECT * FROM posts_unpartitioned;
+            DROP TABLE posts_unpartitioned;
+        END IF;
+    END $$
+    """,
+    "CREATE TABLE IF NOT EXISTS posts_default PARTITION OF posts DEFAULT",
+    "CREATE INDEX IF NOT EXISTS ix_posts_embedding_hnsw ON posts USING hnsw (embedding vector_cosine_ops) "
+    "WITH (m = 16, ef_construction = 64)",
+    "CREATE INDEX IF NOT EXISTS ix_posts_channel_link_published_at ON posts (channel_link, published_at)",
+    "CREATE SEQUENCE IF NOT EXISTS cluster_label_seq MINVALUE 0 START WITH 0",
+]
+
+
+async def apply_extensions(conn: AsyncConnection) -> None:
+    for statement in EXTENSIONS:
+        await conn.execute(text(statement))
+
+
+async def apply_migrations(conn: AsyncConnection) -> None:
+    for statement in MIGRATIONS:
+        await conn.execute(text(statement))
@@ -1,3 +1,6 @@
+import asyncio
+import logging
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from core.config.config_loader import main_config
 from database.db_session_maker import close_db_connection, initialize_database
@@ -5,11 +8,22 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers.channel import channel_router
 from routers.question import question_router
+from services.compute_pool import compute_pool
 from services.daily_post_handler import DailyPostHandler
-from services.telethon_client import client_instance
+from services.telethon_client import client_pool
 
 # Инициализация расписания
 scheduler = AsyncIOScheduler()
+# Фоновые задачи приложения; ссылки держатся, пока задачи не завершатся
+background_tasks = set()
+logger = logging.getLogger(__name__)
+
+
+def on_background_task_done(task: asyncio.Task) -> None:
+    background_tasks.discard(task)
+    # Без обработчика исключение фоновой задачи теряется, и API молча остаётся без индекса qrag
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed", exc_info=task.exception())
 
 
 async def daily_task():
@@ -17,14 +31,16 @@ async def daily_task():
 
 
 async def startup_event():
-    # Подключаем Telethon клиент
-    await client_instance.connect()
+    # Подключаем все аккаунты пула Telethon
+    await client_pool.connect()
     await initialize_database()
 
-    # Запускаем расписание задач
-    daily_post_handler = DailyPostHandler(client_instance, days_to_keep=main_config.daily_post_handler.days_to_keep)
-    await daily_post_handler.run_daily_tasks()
-    scheduler.add_job(daily_post_handler.run_daily_tasks, "cron", hour=0, minute=0)
+    # Запускаем расписание задач. Ежедневный запуск идёт в фоне, чтобы API отвечал сразу после рестарта
+    daily_post_handler = DailyPostHandler(client_pool, config=main_config.daily_post_handler)
+    daily_run = asyncio.create_task(daily_post_handler.run_daily_tasks(), name="startup_daily_run")
+    background_tasks.add(daily_run)
+    daily_run.add_done_callback(on_background_task_done)
+    daily_post_handler.add_scheduled_jobs(scheduler)
     # scheduler.add_job(daily_post_handler.run_daily_tasks, "cron", minute="*/1")
 
     scheduler.start()
@@ -33,11 +49,12 @@ async def startup_event():
 
 
 async def shutdown_event():
-    # Отключаем Telethon клиент
-    await client_instance.disconnect()
+    # Отключаем аккаунты пула Telethon
+    await client_pool.disconnect()
     await close_db_connection()
     # Останавливаем расписание
     scheduler.shutdown()
+    compute_pool.shutdown()
 
 
 tags_metadata = [
@@ -1,5 +1,9 @@
 from models.channel import Channel
+from models.channel_set_post import ChannelSetPost
+from models.content_cache import ContentCacheEntry
+from models.daily_run import DailyRun, DailyRunChannel
 from models.post import Post
 from models.subscription import Subscription
+from models.telegram_entity import TelegramEntity
 from models.user import User
 from models.user_channel import UserChannel
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, ForeignKey, String
+from sqlalchemy import Column, Float, String
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -7,9 +7,10 @@ from .base import Base
 class AggregatedPost(Base):
     __tablename__ = "aggregated_posts"
 
-    post_link = Column(String, ForeignKey("posts.post_link"), primary_key=True, nullable=False)
+    # Ссылка на posts.post_link; строки удалённых постов чистит crud.post.drop_post_partitions_before
+    post_link = Column(String, primary_key=True, nullable=False)
     importance_score = Column(Float, nullable=False)
     cluster_label = Column(String, nullable=False)
 
     # Отношение к Post
-    post = relationship("Post", back_populates="aggregated_posts")
+    post = relationship("Post", primaryjoin="foreign(AggregatedPost.post_link) == Post.post_link", viewonly=True)
@@ -1,5 +1,5 @@
 from models.base import Base
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String
 from sqlalchemy.orm import relationship
 
 
@@ -9,6 +9,14 @@ class Channel(Base):
 
     channel_link = Column(String, primary_key=True, unique=True)
     subs_cnt = Column(Integer, default=0)
+    subs_updated_at = Column(DateTime(timezone=True), nullable=True)
+    # Последнее сообщение канала, уже прочитанное из Telegram (high-water mark)
+    last_message_id = Column(BigInteger, nullable=True)
+    last_message_date = Column(DateTime(timezone=True), nullable=True)
+    # Частота сообщений канала в сутки (скользящее среднее) и расписание его обновлений
+    posts_per_day = Column(Float, nullable=True)
+    refreshed_at = Column(DateTime(timezone=True), nullable=True)
+    next_refresh_at = Column(DateTime(timezone=True), nullable=True, index=True)
 
     # Связь с таблицей UserChannels и Posts
     user_channels = relationship("UserChannel", back_populates="channel")
@@ -0,0 +1,14 @@
+from models.base import Base
+from sqlalchemy import Column, Float, String
+
+
+# Оценки постов, пересчитанные для одного набора каналов пользователя
+class ChannelSetPost(Base):
+    __tablename__ = "channel_set_posts"
+
+    # Отпечаток отсортированного набора каналов (crud.aggregated_posts.channel_set_fingerprint):
+    # пользователи с одинаковыми каналами читают одни и те же строки
+    channel_set = Column(String, primary_key=True)
+    post_link = Column(String, primary_key=True)
+    importance_score = Column(Float, nullable=False)
+    cluster_label = Column(String, nullable=False)
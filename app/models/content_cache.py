@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from models.base import Base
+from sqlalchemy import ARRAY, Column, DateTime, Float, Integer, String, Text
+
+
+# Кэш заголовков и эмбеддингов по хэшу нормализованного текста поста
+class ContentCacheEntry(Base):
+    __tablename__ = "content_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    model_version = Column(String, primary_key=True)
+    title = Column(Text, nullable=True)
+    embedding = Column(ARRAY(Float), nullable=True)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    last_used_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False, index=True
+    )
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+from models.base import Base
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+
+# Этапы ежедневного запуска в порядке выполнения
+RUN_STAGES = ("ingest", "embed", "aggregate", "done")
+# Промежуточное обновление каналов в течение дня: без агрегации
+REFRESH_RUN_STAGES = ("ingest", "embed", "done")
+RUN_KIND_STAGES = {"daily": RUN_STAGES, "refresh": REFRESH_RUN_STAGES}
+# Упразднённые этапы и этапы, с которых продолжаются остановленные на них запуски
+# (index — faiss-индекс qrag, вопросы теперь ищут посты в Postgres)
+RETIRED_RUN_STAGES = {"index": "aggregate"}
+
+
+# Состояние ежедневного запуска: после рестарта незавершённый запуск продолжается с сохранённого этапа
+class DailyRun(Base):
+    __tablename__ = "daily_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False, default="daily", server_default="daily")
+    stage = Column(String, nullable=False, default=RUN_STAGES[0])
+    started_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Воркер, выполняющий этапы после загрузки; updated_at служит его heartbeat
+    owner = Column(String, nullable=True)
+
+
+# Состояние канала внутри запуска: pending → running → done | failed.
+# Строки со статусом pending — очередь, из которой воркеры забирают каналы через FOR UPDATE SKIP LOCKED
+class DailyRunChannel(Base):
+    __tablename__ = "daily_run_channels"
+
+    run_id = Column(Integer, ForeignKey("daily_runs.id", ondelete="CASCADE"), primary_key=True)
+    channel_link = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="pending")
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+    claimed_by = Column(String, nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,25 +1,43 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import ARRAY, Column, DateTime, Float, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import deferred, relationship
 
 from .base import Base
 
+# Размерность эмбеддингов GigaChat
+EMBEDDING_DIM = 1024
 
+
+# Таблица секционирована по published_at (см. crud.post.ensure_post_partitions), поэтому published_at входит
+# в первичный ключ, а старые посты удаляются целыми секциями
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_channel_link_published_at", "channel_link", "published_at"),
+        {"postgresql_partition_by": "RANGE (published_at)"},
+    )
 
-    post_link = Column(String, primary_key=True, unique=True)
+    post_link = Column(String, primary_key=True)
     channel_link = Column(String, ForeignKey("channels.channel_link"), nullable=False)
-    text = Column(Text, nullable=False)  # TODO: remove this parameter
+    # text и embedding — самые тяжёлые колонки, загружаются только по запросу (undefer или проекции в crud.post)
+    text = deferred(Column(Text, nullable=False))  # TODO: remove this parameter
     title = Column(Text, nullable=True)  # Summarized title
-    embedding = Column(ARRAY(Float), nullable=True)
+    embedding = deferred(
+        Column(Vector(EMBEDDING_DIM), nullable=True)
+    )  # pgvector, HNSW-индекс по косинусному расстоянию
+    simhash = Column(BigInteger, nullable=True)  # SimHash текста для поиска почти одинаковых постов
     amount_reactions = Column(Integer, default=0)
     amount_comments = Column(Integer, default=0)
-    published_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    published_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False, primary_key=True
+    )
 
     # Связь с таблицей Channels
     channel = relationship("Channel", back_populates="posts")
 
-    # Обратная связь с AggregatedPost
-    aggregated_posts = relationship("AggregatedPost", back_populates="post")
+    # Обратная связь с AggregatedPost (без внешнего ключа: на секционированную таблицу по post_link не сослаться)
+    aggregated_posts = relationship(
+        "AggregatedPost", primaryjoin="Post.post_link == foreign(AggregatedPost.post_link)", viewonly=True
+    )
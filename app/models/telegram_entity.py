@@ -0,0 +1,17 @@
+from datetime import datetime, timezone
+
+from models.base import Base
+from sqlalchemy import BigInteger, Column, DateTime, String
+
+
+# Разрешённые сущности Telegram-каналов. access_hash привязан к аккаунту Telethon,
+# поэтому ключ включает имя сессии. Сущность сохраняется ещё до создания канала в /channel/add,
+# поэтому внешнего ключа на channels нет
+class TelegramEntity(Base):
+    __tablename__ = "telegram_entities"
+
+    session_name = Column(String, primary_key=True)
+    channel_link = Column(String, primary_key=True)
+    tg_id = Column(BigInteger, nullable=False)
+    access_hash = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
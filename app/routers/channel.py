@@ -6,8 +6,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from routers import check_api_key_access
 from routers.utils import extract_channel_username
 from schemas.channel import ChannelAddRequest, ChannelAddResponse
-from services.channel_handler import get_channel_subscribers_count
-from services.telethon_client import get_telethon_client
+from services.channel_handler import ChannelLookupError, get_channel_subscribers_count_from_pool
+from services.telethon_client import get_telethon_pool
 from sqlalchemy.ext.asyncio import AsyncSession
 
 channel_router = APIRouter(prefix="/channel", tags=["channels"])
@@ -21,7 +21,7 @@ channel_router = APIRouter(prefix="/channel", tags=["channels"])
 async def add_channels_for_user(
     data: ChannelAddRequest,
     db: AsyncSession = Depends(get_db_session),
-    telethon_client=Depends(get_telethon_client),
+    telethon_pool=Depends(get_telethon_pool),
     api_key=Depends(check_api_key_access),
 ):
     result = []
@@ -35,11 +35,14 @@ async def add_channels_for_user(
                 channel_info.exists = True
             else:
                 # Получаем количество подписчиков через отдельную функцию
-                subs_cnt = await get_channel_subscribers_count(telethon_client, channel_name)
+                subs_cnt = await get_channel_subscribers_count_from_pool(telethon_pool, db, channel_name)
                 if subs_cnt is not None:
                     # Создаем канал в базе данных
                     await create_channel(db, channel_link=channel_name, subs_cnt=subs_cnt)
                     channel_info.exists = True
+        except ChannelLookupError as e:
+            logging.exception(f"Telegram lookup failed for channel {channel_name}: {e}")
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Telegram request failed")
         except Exception as e:
             logging.exception(f"Unexpected error processing channel {channel_name}: {e}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -1,3 +1,4 @@
+from crud.channel import get_user_channel_links
 from database import get_db_session
 from fastapi import APIRouter, Depends
 from routers import check_api_key_access
@@ -14,10 +15,20 @@ async def ask_question(
     db: AsyncSession = Depends(get_db_session),
     api_key=Depends(check_api_key_access),
 ) -> str:
-    # Placeholder logic for answering the question
-    answer = qrag.answer_question(
+    user_query = question_request.question
+    if not user_query:
+        user_query = (
+            question_request.query_history[-1] if question_request.query_history else question_request.digest_text
+        )
+
+    # Посты для ответа ищутся в Postgres (pgvector) среди каналов пользователя и кластеров дайджеста
+    channel_links = await get_user_channel_links(db, question_request.user_id)
+    answer = await qrag.aanswer_question(
+        db,
         clusters=question_request.clusters,
         digest_text=question_request.digest_text,
         query_history=question_request.query_history,
+        user_query=user_query,
+        channel_links=channel_links,
     )
     return answer
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -8,3 +8,5 @@ class QuestionRequest(BaseModel):
     clusters: List[int]
     digest_text: str
     query_history: List[str]
+    # Прежние клиенты вопрос не передают: тогда вопросом считается последний запрос истории (см. routers.question)
+    question: Optional[str] = None
@@ -1,113 +1,154 @@
-from collections import Counter
-from typing import Dict, List
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
 
 import numpy as np
-from crud.aggregated_posts import add_aggregated_post, clear_aggregated_posts
-from crud.post import get_all_posts
-from models.post import Post
-from sklearn.cluster import AgglomerativeClustering
+from core.config import main_config
+from crud.aggregated_posts import (
+    channel_set_fingerprint,
+    get_cluster_labels,
+    get_next_cluster_label,
+    replace_aggregated_posts,
+    replace_channel_set_posts,
+    set_next_cluster_label,
+)
+from crud.channel import get_user_channel_sets
+from crud.post import get_post_embeddings, get_post_metrics
+from services.clustering import cluster_shared_posts
+from services.compute_pool import compute_pool, shared_array
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+@dataclass
+class PostFrame:
+    """
+    Посты для агрегации в колоночном виде: i-я строка каждого массива относится к post_links[i].
+    """
+
+    post_links: List[str]
+    # (n, EMBEDDING_DIM) float32; в подмножества постов не копируется
+    embeddings: Optional[np.ndarray]
+    # Номер канала поста в списке channels
+    channel_codes: np.ndarray
+    channels: List[str]
+    reactions: np.ndarray
+    comments: np.ndarray
+    subscribers: np.ndarray
+    # Время публикации, секунды Unix
+    published_at: np.ndarray
+    cluster_labels: Optional[np.ndarray] = None
+    importance_scores: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.post_links)
+
+    def subset(self, indices: np.ndarray) -> "PostFrame":
+        # Посты с данными индексами, с уже посчитанными метками кластеров, но без эмбеддингов
+        return PostFrame(
+            post_links=[self.post_links[idx] for idx in indices.tolist()],
+            embeddings=None,
+            channel_codes=self.channel_codes[indices],
+            channels=self.channels,
+            reactions=self.reactions[indices],
+            comments=self.comments[indices],
+            subscribers=self.subscribers[indices],
+            published_at=self.published_at[indices],
+            cluster_labels=self.cluster_labels[indices],
+        )
+
+
 class Aggregator:
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def compute_and_store_importance_scores(self) -> None:
         # Получаем все посты для оценки
-        all_posts = await self._get_posts_data()
+        posts = await self._get_posts_data()
 
-        if not all_posts:
+        if not len(posts):
             return
 
-        # Выполняем кластеризацию постов
-        self._perform_clustering(all_posts)
+        # Выполняем кластеризацию постов, продолжая кластеры прошлого запуска
+        previous_labels = await get_cluster_labels(self.session) if main_config.clustering.incremental else {}
+        await self._perform_clustering(posts, previous_labels)
 
         # Вычисляем оценки важности для постов
-        self._calculate_importance_scores(all_posts)
+        self._calculate_importance_scores(posts)
 
         # Очищаем текущие данные и сохраняем новые результаты
-        await self._store_importance_scores(all_posts)
-
-    async def _get_posts_data(self) -> List[Dict]:
-        posts: List[Post] = await get_all_posts(self.session)
-        if not posts:
-            return []
-
-        all_posts = []
-        for post in posts:
-            channel = post.channel
-
-            subscribers = channel.subs_cnt or 0
-            post_data = {
-                "post": post,
-                "embedding": post.embedding,
-                "reactions": post.amount_reactions or 0,
-                "comments": post.amount_comments or 0,
-                "publication_date": post.published_at,
-                "channel": channel,
-                "subscribers": subscribers,
-            }
-            all_posts.append(post_data)
-
-        return all_posts
-
-    def _perform_clustering(self, all_posts: List[Dict]) -> None:
-        embeddings = np.array([post_data["embedding"] for post_data in all_posts]).reshape(-1, 1024)
-
-        # Кластеризация с помощью DBSCAN
-        clustering = AgglomerativeClustering(
-            metric="cosine",
-            linkage="average",
-            distance_threshold=0.11,
-            n_clusters=None,
-        ).fit(embeddings)
-        cluster_labels = clustering.labels_
-
-        # Добавляем метки кластеров к постам
-        for idx, post_data in enumerate(all_posts):
-            post_data["cluster_label"] = cluster_labels[idx]
-
-    def _calculate_importance_scores(self, all_posts: List[Dict]) -> None:
-        cluster_labels = [post_data["cluster_label"] for post_data in all_posts]
-        cluster_counts = Counter(cluster_labels)
-
-        # Получаем даты публикации
-        publication_dates = [post_data["publication_date"] for post_data in all_posts]
-        earliest_publication_date = min(publication_dates)
-        latest_publication_date = max(publication_dates)
-        total_time_range = (latest_publication_date - earliest_publication_date).total_seconds() or 1
-
-        # Инициализация списков метрик
-        cluster_importances = []
-        engagement_scores = []
-        recency_scores = []
-
-        for post_data in all_posts:
-            cluster_label = post_data["cluster_label"]
-            cluster_size = cluster_counts[cluster_label]
-
-            # Важность кластера пропорциональна его размеру
-            cluster_importance = cluster_size
-            cluster_importances.append(cluster_importance)
-
-            # Вовлеченность, нормализованная на подписчиков
-            engagement = post_data["reactions"] + post_data["comments"]
-            subscribers = post_data["subscribers"]
-            engagement_norm = np.log1p(engagement)
-            subscribers_norm = np.log1p(subscribers)
-            engagement_score = engagement_norm / subscribers_norm if subscribers_norm > 0 else 0
-            engagement_scores.append(engagement_score)
-
-            # Оценка новизны
-            recency_seconds = (post_data["publication_date"] - earliest_publication_date).total_seconds()
-            recency_score = recency_seconds / total_time_range
-            recency_scores.append(recency_score)
-
-        # Нормализация метрик
-        cluster_importances_norm = self._normalize_metric(cluster_importances)
-        engagement_scores_norm = self._normalize_metric(engagement_scores)
-        recency_scores_norm = self._normalize_metric(recency_scores)
+        await self._store_importance_scores(posts)
+
+        # Оценки для наборов каналов пользователей
+        if main_config.channel_sets.enabled:
+            await self._store_channel_set_scores(posts)
+
+    async def _get_posts_data(self) -> PostFrame:
+        # Метрики и эмбеддинги читаются проекциями: без текстов постов и ORM-объектов.
+        # Посты без эмбеддинга в обе выборки не попадают и будут агрегированы в следующий запуск
+        post_links, embeddings = await get_post_embeddings(self.session)
+        metrics = await get_post_metrics(self.session)
+
+        metric_positions = {row.post_link: idx for idx, row in enumerate(metrics)}
+        positions = np.fromiter((metric_positions.get(post_link, -1) for post_link in post_links), dtype=np.int64)
+        # Пост удалён или изменён между двумя запросами
+        found = positions >= 0
+        positions = positions[found]
+
+        channels, channel_codes = np.unique([row.channel_link for row in metrics], return_inverse=True)
+        return PostFrame(
+            post_links=[post_link for post_link, keep in zip(post_links, found.tolist()) if keep],
+            embeddings=embeddings if found.all() else embeddings[found],
+            channel_codes=channel_codes.astype(np.int64)[positions],
+            channels=channels.tolist(),
+            reactions=np.fromiter((row.amount_reactions for row in metrics), dtype=np.int64)[positions],
+            comments=np.fromiter((row.amount_comments for row in metrics), dtype=np.int64)[positions],
+            subscribers=np.fromiter((row.subs_cnt for row in metrics), dtype=np.int64)[positions],
+            published_at=np.fromiter((row.published_at.timestamp() for row in metrics), dtype=np.float64)[positions],
+        )
+
+    async def _perform_clustering(self, posts: PostFrame, previous_labels: Dict[str, str]) -> None:
+        config = main_config.clustering
+        # -1 — пост, которого не было в прошлом запуске
+        known_labels = np.fromiter(
+            (int(previous_labels.get(post_link, -1)) for post_link in posts.post_links), dtype=np.int64
+        )
+
+        # Средняя связь с порогом косинусного расстояния; бэкенд задаётся в конфиге clustering.
+        # Без прошлых меток или в день полной перестройки кластеры строятся по всем постам.
+        # Кластеризация идёт в процессе compute_pool, эмбеддинги передаются через разделяемую память
+        full_rebuild = (
+            config.full_rebuild_interval_days <= 0 or date.today().toordinal() % config.full_rebuild_interval_days == 0
+        )
+        # Новые кластеры получают метки больше всех выданных раньше, а не больше оставшихся в aggregated_posts
+        next_label = max(await get_next_cluster_label(self.session), int(known_labels.max()) + 1)
+        with shared_array(posts.embeddings) as embeddings:
+            posts.cluster_labels = await compute_pool.run(
+                cluster_shared_posts,
+                embeddings,
+                known_labels,
+                config,
+                full_rebuild,
+                main_config.reduction,
+                next_label,
+            )
+        await set_next_cluster_label(self.session, max(next_label, int(posts.cluster_labels.max()) + 1))
+
+    def _calculate_importance_scores(self, posts: PostFrame) -> None:
+        # Важность кластера пропорциональна его размеру
+        _, cluster_index, cluster_counts = np.unique(posts.cluster_labels, return_inverse=True, return_counts=True)
+        cluster_importances = cluster_counts[cluster_index]
+
+        # Вовлеченность, нормализованная на подписчиков
+        engagement_norm = np.log1p(posts.reactions + posts.comments)
+        subscribers_norm = np.log1p(posts.subscribers)
+        engagement_scores = np.divide(
+            engagement_norm, subscribers_norm, out=np.zeros(len(posts)), where=subscribers_norm > 0
+        )
+
+        # Оценка новизны
+        earliest_publication = posts.published_at.min()
+        total_time_range = (posts.published_at.max() - earliest_publication) or 1
+        recency_scores = (posts.published_at - earliest_publication) / total_time_range
 
         # Весовые коэффициенты
         w_cluster = 1 / 3
@@ -115,16 +156,14 @@ class Aggregator:
         w_recency = 1 / 3
 
         # Вычисление итоговой оценки важности
-        for idx, post_data in enumerate(all_posts):
-            importance_score = (
-                w_cluster * cluster_importances_norm[idx]
-                + w_engagement * engagement_scores_norm[idx]
-                + w_recency * recency_scores_norm[idx]
-            )
-            post_data["importance_score"] = importance_score
-
-    def _normalize_metric(self, metric_array: List[float]) -> np.ndarray:
-        metric_array = np.array(metric_array)
+        posts.importance_scores = (
+            w_cluster * self._normalize_metric(cluster_importances)
+            + w_engagement * self._normalize_metric(engagement_scores)
+            + w_recency * self._normalize_metric(recency_scores)
+        )
+
+    def _normalize_metric(self, metric_array: np.ndarray) -> np.ndarray:
+        metric_array = np.asarray(metric_array, dtype=np.float64)
         min_val = metric_array.min()
         max_val = metric_array.max()
         if max_val > min_val:
@@ -133,17 +172,47 @@ class Aggregator:
             normalized = np.zeros_like(metric_array)
         return normalized
 
-    async def _store_importance_scores(self, all_posts: List[Dict]) -> None:
-        # Очищаем текущие данные по агрегированным постам
-        await clear_aggregated_posts(self.session)
-
-        # Пакетное добавление постов для повышения производительности
-        for post_data in all_posts:
-            await add_aggregated_post(
-                db=self.session,
-                post_link=post_data["post"].post_link,
-                importance_score=post_data["importance_score"],
-                cluster_label=str(post_data["cluster_label"]),
+    async def _store_channel_set_scores(self, posts: PostFrame) -> None:
+        """
+        Оценивает посты каждого набора каналов пользователей отдельно, без новой кластеризации:
+        кластер поста в наборе — его общий кластер, ограниченный каналами набора, поэтому важность
+        сюжета определяется тем, сколько каналов пользователя о нём написали.
+        Пользователи с одинаковым набором каналов делят одно вычисление.
+        """
+        channel_sets = {}
+        for channel_links in (await get_user_channel_sets(self.session)).values():
+            channel_sets.setdefault(channel_set_fingerprint(channel_links), channel_links)
+
+        # Индексы постов каждого канала: пост набора — объединение постов его каналов
+        order = np.argsort(posts.channel_codes, kind="stable")
+        bounds = np.searchsorted(posts.channel_codes[order], np.arange(len(posts.channels) + 1))
+        channel_positions = {channel: idx for idx, channel in enumerate(posts.channels)}
+
+        top_posts = main_config.channel_sets.top_posts
+        rows = []
+        for fingerprint, channel_links in channel_sets.items():
+            codes = [channel_positions[channel] for channel in channel_links if channel in channel_positions]
+            if not codes:
+                continue
+            indices = np.concatenate([order[bounds[code] : bounds[code + 1]] for code in codes])
+            scoped_posts = posts.subset(indices)
+            self._calculate_importance_scores(scoped_posts)
+
+            top = np.argsort(-scoped_posts.importance_scores, kind="stable")[:top_posts]
+            rows.extend(
+                (fingerprint, scoped_posts.post_links[idx], score, str(label))
+                for idx, score, label in zip(
+                    top.tolist(),
+                    scoped_posts.importance_scores[top].tolist(),
+                    scoped_posts.cluster_labels[top].tolist(),
+                )
             )
-        # Асинхронное выполнение добавления постов
-        # await asyncio.gather(*tasks)
+
+        stored_count = await replace_channel_set_posts(self.session, rows)
+        print(f"Stored {stored_count} posts for {len(channel_sets)} channel sets")
+
+    async def _store_importance_scores(self, posts: PostFrame) -> None:
+        # Новые оценки публикуются одной подменой таблицы, без окна с пустым aggregated_posts
+        rows = list(zip(posts.post_links, posts.importance_scores.tolist(), posts.cluster_labels.astype(str).tolist()))
+        stored_count = await replace_aggregated_posts(self.session, rows)
+        print(f"Stored {stored_count} aggregated posts")
@@ -1,22 +1,78 @@
-import logging
-
-from fastapi import HTTPException
-from telethon.errors import ChannelInvalidError, ChannelPrivateError
+from crud.telegram_entity import delete_telegram_entity, get_telegram_entity, save_telegram_entity
+from services.telethon_client import TelethonClient, TelethonClientPool
+from sqlalchemy.ext.asyncio import AsyncSession
+from telethon.errors import ChannelInvalidError, ChannelPrivateError, FloodWaitError
 from telethon.tl.functions.channels import GetFullChannelRequest
-from telethon.tl.types import Channel
+from telethon.tl.types import Channel, InputPeerChannel
+
+
+class ChannelLookupError(Exception):
+    """Не удалось получить данные канала из Telegram по причине, отличной от недоступности канала."""
+
+
+async def resolve_channel_entity(
+    telethon_client: TelethonClient, session: AsyncSession, channel_name: str
+) -> InputPeerChannel | None:
+    """
+    Возвращает InputPeerChannel канала. id и access_hash хранятся в БД,
+    поэтому get_entity (ResolveUsername) вызывается только для ещё не известных каналов.
+    """
+    cached = await get_telegram_entity(session, telethon_client.session_name, channel_name)
+    if cached:
+        return InputPeerChannel(channel_id=cached.tg_id, access_hash=cached.access_hash)
+
+    entity = await telethon_client.client.get_entity(channel_name)
+    if not isinstance(entity, Channel):
+        return None
+    await save_telegram_entity(session, telethon_client.session_name, channel_name, entity.id, entity.access_hash)
+    return InputPeerChannel(channel_id=entity.id, access_hash=entity.access_hash)
+
 
-logger = logging.getLogger(__name__)
+async def _get_full_channel(telethon_client: TelethonClient, session: AsyncSession, channel_name: str):
+    input_channel = await resolve_channel_entity(telethon_client, session, channel_name)
+    if input_channel is None:
+        return None
+    try:
+        return await telethon_client.client(GetFullChannelRequest(channel=input_channel))
+    except (ChannelInvalidError, ValueError):
+        # Сохранённый access_hash устарел — разрешаем канал заново
+        await delete_telegram_entity(session, telethon_client.session_name, channel_name)
+        input_channel = await resolve_channel_entity(telethon_client, session, channel_name)
+        if input_channel is None:
+            return None
+        return await telethon_client.client(GetFullChannelRequest(channel=input_channel))
 
 
 # Вынесенная функция для получения количества подписчиков канала
-async def get_channel_subscribers_count(telethon_client, channel_name: str) -> int:
+async def get_channel_subscribers_count(
+    telethon_client: TelethonClient, session: AsyncSession, channel_name: str
+) -> int | None:
     try:
-        entity = await telethon_client.get_entity(channel_name)
-        if isinstance(entity, Channel):
-            full_channel = await telethon_client(GetFullChannelRequest(channel=entity))
+        full_channel = await _get_full_channel(telethon_client, session, channel_name)
+        if full_channel is not None:
             return full_channel.full_chat.participants_count
     except (ChannelInvalidError, ChannelPrivateError, ValueError):
         return None
+    except FloodWaitError:
+        # Решение об ожидании принимает вызывающий код
+        raise
     except Exception as e:
-        logger.exception(f"Unexpected error getting subscribers count for channel {channel_name}: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
+        # Вызывается и из API, и из конвейера загрузки: перевод в HTTP-ответ делает роутер
+        raise ChannelLookupError(f"Cannot get subscribers count for channel {channel_name}: {e}") from e
+
+
+async def get_channel_subscribers_count_from_pool(
+    telethon_pool: TelethonClientPool, session: AsyncSession, channel_name: str
+) -> int | None:
+    """
+    Запрашивает число подписчиков через аккаунт, закреплённый за каналом.
+    При FloodWait запрос переходит к следующему аккаунту пула.
+    """
+    flood_wait_error = None
+    for telethon_client in telethon_pool.clients_for(channel_name):
+        try:
+            return await get_channel_subscribers_count(telethon_client, session, channel_name)
+        except FloodWaitError as e:
+            telethon_pool.report_flood_wait(telethon_client, e.seconds)
+            flood_wait_error = e
+    raise flood_wait_error
@@ -0,0 +1,261 @@
+import heapq
+from typing import Callable, Dict, List, Set, Tuple
+
+import faiss
+import numpy as np
+from core.config.models.clustering import ClusteringConfig
+from core.config.models.reduction import ReductionConfig
+from services.compute_pool import SharedArray
+from services.reduction import fit_projection, project
+from sklearn.cluster import AgglomerativeClustering
+
+
+def cluster_embeddings(embeddings: np.ndarray, config: ClusteringConfig) -> np.ndarray:
+    """
+    Кластеризует эмбеддинги постов выбранным в конфиге бэкендом.
+    Возвращает метки кластеров 0..k-1 в порядке строк embeddings.
+    """
+    backend = CLUSTERING_BACKENDS.get(config.backend)
+    if backend is None:
+        raise ValueError(f"Unknown clustering backend: {config.backend}")
+    if len(embeddings) < 2:
+        return np.zeros(len(embeddings), dtype=np.int64)
+    return backend(embeddings, config)
+
+
+def cluster_shared_posts(
+    embeddings: SharedArray,
+    previous_labels: np.ndarray,
+    config: ClusteringConfig,
+    full_rebuild: bool,
+    reduction: ReductionConfig,
+    next_label: int,
+) -> np.ndarray:
+    """
+    Точка входа для процесса compute_pool: эмбеддинги читаются из разделяемой памяти без копирования.
+    Без меток прошлого запуска кластеры строятся с нуля, иначе перестраиваются или обновляются инкрементально.
+    Если включено понижение размерности, кластеризуются сжатые векторы.
+    next_label — первая метка для новых кластеров; метки меньше неё уже выдавались.
+    """
+    memory, matrix = embeddings.attach()
+    try:
+        projection, retained = fit_projection(matrix, reduction)
+        if projection is not None:
+            print(f"Clustering on {projection.shape[1]}-d vectors, retained energy {retained:.3f}")
+            matrix = project(matrix, projection)
+        if (previous_labels < 0).all():
+            return match_labels(cluster_embeddings(matrix, config), previous_labels, next_label)
+        if full_rebuild:
+            return rebuild_clusters(matrix, previous_labels, config, next_label)
+        return update_clusters(matrix, previous_labels, config, next_label)
+    finally:
+        del matrix
+        memory.close()
+
+
+def update_clusters(
+    embeddings: np.ndarray, previous_labels: np.ndarray, config: ClusteringConfig, next_label: int
+) -> np.ndarray:
+    """
+    Инкрементально обновляет кластеры прошлого запуска.
+    previous_labels — метка поста в прошлом запуске или -1 для нового поста; удалённые посты просто
+    отсутствуют во входе. Новые посты сравниваются со средними векторами старых кластеров, и вместе
+    с ними заново кластеризуются только кластеры ближе distance_threshold + affected_margin.
+    Остальные посты сохраняют метки; новые кластеры по возможности наследуют старые метки.
+    """
+    new_mask = previous_labels < 0
+    if not new_mask.any():
+        return previous_labels.copy()
+    if new_mask.mean() > config.max_new_fraction:
+        return rebuild_clusters(embeddings, previous_labels, config, next_label)
+
+    vectors = _normalize(embeddings)
+    cluster_ids, cluster_means = _cluster_means(vectors[~new_mask], previous_labels[~new_mask])
+    # Для нормированных векторов скалярное произведение со средним вектором кластера —
+    # средняя косинусная близость поста к его членам, то есть расстояние средней связи
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(cluster_means)
+    similarities, nearest = index.search(vectors[new_mask], min(config.knn_neighbors, len(cluster_ids)))
+    near = (nearest >= 0) & (1.0 - similarities < config.distance_threshold + config.affected_margin)
+    affected_mask = new_mask | np.isin(previous_labels, cluster_ids[np.unique(nearest[near])])
+
+    labels = previous_labels.copy()
+    affected_labels = cluster_embeddings(vectors[affected_mask], config)
+    labels[affected_mask] = match_labels(affected_labels, previous_labels[affected_mask], next_label)
+    return labels
+
+
+def rebuild_clusters(
+    embeddings: np.ndarray, previous_labels: np.ndarray, config: ClusteringConfig, next_label: int
+) -> np.ndarray:
+    # Полная перекластеризация; метки по-прежнему наследуются от прошлого запуска
+    labels = cluster_embeddings(embeddings, config)
+    return match_labels(labels, previous_labels, next_label)
+
+
+def match_labels(labels: np.ndarray, previous_labels: np.ndarray, next_label: int) -> np.ndarray:
+    """
+    Переводит метки новой кластеризации в метки прошлого запуска.
+    Пары (новый кластер, старый кластер) перебираются по убыванию числа общих постов,
+    каждая старая метка достаётся не больше чем одному новому кластеру; остальным выдаются новые метки.
+    """
+    known = previous_labels >= 0
+    pairs, counts = np.unique(np.stack([labels[known], previous_labels[known]], axis=1), axis=0, return_counts=True)
+    mapping: Dict[int, int] = {}
+    used = set()
+    for new_label, old_label in pairs[np.argsort(-counts, kind="stable")].tolist():
+        if new_label in mapping or old_label in used:
+            continue
+        mapping[new_label] = old_label
+        used.add(old_label)
+
+    unique_labels, inverse = np.unique(labels, return_inverse=True)
+    result = np.empty(len(unique_labels), dtype=np.int64)
+    for idx, label in enumerate(unique_labels.tolist()):
+        if label not in mapping:
+            mapping[label] = next_label
+            next_label += 1
+        result[idx] = mapping[label]
+    return result[inverse]
+
+
+def agglomerative_clustering(embeddings: np.ndarray, config: ClusteringConfig) -> np.ndarray:
+    # Точная средняя связь по всем парам: O(n²) памяти, подходит для десятков тысяч постов
+    clustering = AgglomerativeClustering(
+        metric="cosine",
+        linkage="average",
+        distance_threshold=config.distance_threshold,
+        n_clusters=None,
+    ).fit(embeddings)
+    return clustering.labels_
+
+
+def knn_graph_clustering(embeddings: np.ndarray, config: ClusteringConfig) -> np.ndarray:
+    """
+    Средняя связь по графу ближайших соседей.
+    Кандидаты на объединение — только пары соседей из faiss ближе distance_threshold, но расстояние
+    между кластерами точное: для нормированных векторов средняя косинусная близость двух кластеров
+    равна скалярному произведению сумм их векторов, делённому на произведение размеров.
+    """
+    vectors = _normalize(embeddings)
+    similarities, neighbors = _search_neighbors(vectors, config)
+    return _graph_average_linkage(vectors, similarities, neighbors, config.distance_threshold)
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    vectors = np.array(embeddings, dtype=np.float32, order="C")
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors
+
+
+def _cluster_means(vectors: np.ndarray, labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(labels, kind="stable")
+    cluster_ids, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+    means = np.add.reduceat(vectors[order], starts, axis=0) / sizes[:, None]
+    return cluster_ids, np.ascontiguousarray(means, dtype=np.float32)
+
+
+def _search_neighbors(vectors: np.ndarray, config: ClusteringConfig) -> Tuple[np.ndarray, np.ndarray]:
+    count, dim = vectors.shape
+    k = min(config.knn_neighbors + 1, count)  # Первый сосед — сам пост
+    if count <= config.exact_search_max_posts:
+        index = faiss.IndexFlatIP(dim)
+    else:
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = config.hnsw_ef_construction
+        index.hnsw.efSearch = max(config.hnsw_ef_search, k)
+    index.add(vectors)
+    return index.search(vectors, k)
+
+
+def _build_candidate_graph(
+    similarities: np.ndarray, neighbors: np.ndarray, distance_threshold: float
+) -> Tuple[List[Set[int]], List[Tuple[float, int, int, int]]]:
+    # Рёбра графа — пары соседей ближе порога; остальные пары никогда не станут кандидатами
+    count, k = neighbors.shape
+    rows = np.repeat(np.arange(count), k)
+    cols = neighbors.ravel()
+    distances = 1.0 - similarities.ravel()
+    mask = (cols >= 0) & (cols != rows) & (distances < distance_threshold)
+    rows, cols, distances = rows[mask].tolist(), cols[mask].tolist(), distances[mask].tolist()
+
+    adjacency = [set() for _ in range(count)]
+    for row, col in zip(rows, cols):
+        adjacency[row].add(col)
+        adjacency[col].add(row)
+    # Записи кучи: (расстояние, кластер, кластер, номер слияния, после которого запись добавлена)
+    heap = [(distance, row, col, 0) for distance, row, col in zip(distances, rows, cols)]
+    heapq.heapify(heap)
+    return adjacency, heap
+
+
+def _graph_average_linkage(
+    vectors: np.ndarray, similarities: np.ndarray, neighbors: np.ndarray, distance_threshold: float
+) -> np.ndarray:
+    count = len(vectors)
+    adjacency, heap = _build_candidate_graph(similarities, neighbors, distance_threshold)
+
+    parent = np.arange(count)
+    sizes = np.ones(count, dtype=np.int64)
+    # Суммы векторов объединённых кластеров; у одиночных постов сумма — сам вектор
+    sums: Dict[int, np.ndarray] = {}
+    # Номер последнего слияния, изменившего кластер: более ранние записи кучи с ним устарели
+    last_merge = np.zeros(count, dtype=np.int64)
+    merge_count = 0
+
+    def cluster_sum(cluster: int) -> np.ndarray:
+        return sums[cluster] if cluster in sums else vectors[cluster]
+
+    while heap:
+        _, left, right, pushed_at = heapq.heappop(heap)
+        # Запись устарела, если кластер поглощён другим или изменился после её добавления
+        if parent[left] != left or parent[right] != right:
+            continue
+        if last_merge[left] > pushed_at or last_merge[right] > pushed_at:
+            continue
+
+        root, other = (left, right) if sizes[left] >= sizes[right] else (right, left)
+        sums[root] = cluster_sum(root) + cluster_sum(other)
+        sums.pop(other, None)
+        sizes[root] += sizes[other]
+        parent[other] = root
+        merge_count += 1
+        last_merge[root] = merge_count
+
+        merged_neighbors = _merge_adjacency(adjacency, root, other)
+
+        # Расстояния от нового кластера до соседей пересчитываются точно
+        if not merged_neighbors:
+            continue
+        neighbor_ids = np.fromiter(merged_neighbors, dtype=np.int64)
+        neighbor_sums = np.stack([cluster_sum(neighbor) for neighbor in neighbor_ids.tolist()])
+        neighbor_distances = 1.0 - neighbor_sums @ sums[root] / (sizes[neighbor_ids] * sizes[root])
+        for neighbor, neighbor_distance in zip(neighbor_ids.tolist(), neighbor_distances.tolist()):
+            if neighbor_distance < distance_threshold:
+                heapq.heappush(heap, (neighbor_distance, root, neighbor, merge_count))
+
+    roots = np.array([_find_root(parent, idx) for idx in range(count)])
+    return np.unique(roots, return_inverse=True)[1]
+
+
+def _merge_adjacency(adjacency: List[Set[int]], root: int, other: int) -> Set[int]:
+    merged_neighbors = (adjacency[root] | adjacency[other]) - {root, other}
+    for neighbor in adjacency[other]:
+        adjacency[neighbor].discard(other)
+        adjacency[neighbor].add(root)
+    adjacency[root] = merged_neighbors
+    adjacency[other] = set()
+    return merged_neighbors
+
+
+def _find_root(parent: np.ndarray, idx: int) -> int:
+    while parent[idx] != idx:
+        parent[idx] = parent[parent[idx]]
+        idx = parent[idx]
+    return idx
+
+
+CLUSTERING_BACKENDS: Dict[str, Callable[[np.ndarray, ClusteringConfig], np.ndarray]] = {
+    "agglomerative": agglomerative_clustering,
+    "knn_graph": knn_graph_clustering,
+}
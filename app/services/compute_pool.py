@@ -0,0 +1,73 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Iterator, Optional, Tuple
+
+import numpy as np
+from core.config import main_config
+from core.config.models.compute_pool import ComputePoolConfig
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """
+    Описание массива в разделяемой памяти: передаётся в процесс пула вместо самих данных.
+    """
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    def attach(self) -> Tuple[SharedMemory, np.ndarray]:
+        # Массив действителен, пока открыт возвращённый блок памяти
+        memory = SharedMemory(name=self.name)
+        return memory, np.ndarray(self.shape, dtype=self.dtype, buffer=memory.buf)
+
+
+@contextmanager
+def shared_array(array: np.ndarray) -> Iterator[SharedArray]:
+    """
+    Копирует массив в новый блок разделяемой памяти и удаляет блок при выходе из контекста.
+    """
+    memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+        yield SharedArray(name=memory.name, shape=array.shape, dtype=array.dtype.str)
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+class ComputePool:
+    """
+    Пул процессов для CPU-тяжёлых стадий (кластеризация), чтобы они
+    не останавливали event loop API. Процессы запускаются через spawn: они не наследуют event loop,
+    соединения с БД и потоки faiss родителя. Большие массивы передаются через shared_array.
+    Процесс пула импортирует модуль задачи и главный модуль программы (как __mp_main__): задачи живут
+    в модулях без клиентов Telethon и GigaChat (services.clustering), а точки входа создают их под __main__.
+    """
+
+    def __init__(self, config: ComputePoolConfig):
+        self.config = config
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        if not self.config.enabled:
+            return await loop.run_in_executor(None, func, *args)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.config.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+compute_pool = ComputePool(config=main_config.compute_pool)
@@ -0,0 +1,87 @@
+import hashlib
+import re
+from typing import Dict, Iterable
+
+import numpy as np
+from core.config import main_config
+from core.config.models.content_cache import ContentCacheConfig
+from crud.content_cache import evict_content_cache, get_cache_entries, upsert_cache_embeddings, upsert_cache_titles
+from sqlalchemy.ext.asyncio import AsyncSession
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+INVISIBLE_CHARS_PATTERN = re.compile(r"[\u200b-\u200f\u2060\ufeff]")
+
+
+class ContentCache:
+    """
+    Кэш заголовков и эмбеддингов по хэшу нормализованного текста.
+    Репосты и повторные публикации одного текста не отправляются в GigaChat повторно.
+    """
+
+    def __init__(self, config: ContentCacheConfig):
+        self.config = config
+        # Счётчики с начала работы процесса: запуски в одном процессе идут одновременно, поэтому не сбрасываются
+        self.stats: Dict[str, int] = {"title_hits": 0, "title_misses": 0, "embedding_hits": 0, "embedding_misses": 0}
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        normalized = INVISIBLE_CHARS_PATTERN.sub("", text)
+        normalized = WHITESPACE_PATTERN.sub(" ", normalized).strip().lower()
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    async def get_titles(self, session: AsyncSession, texts: Iterable[str]) -> Dict[str, str]:
+        """Возвращает закэшированные заголовки по хэшу текста."""
+        texts = list(texts)
+        if not self.config.enabled or not texts:
+            return {}
+
+        entries = await get_cache_entries(session, map(self.content_hash, texts), self.config.model_version)
+        titles = {content_hash: entry.title for content_hash, entry in entries.items() if entry.title}
+        hits = sum(self.content_hash(text) in titles for text in texts)
+        self.stats["title_hits"] += hits
+        self.stats["title_misses"] += len(texts) - hits
+        return titles
+
+    async def get_embeddings(self, session: AsyncSession, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Возвращает закэшированные эмбеддинги (float32) по хэшу текста."""
+        texts = list(texts)
+        if not self.config.enabled or not texts:
+            return {}
+
+        entries = await get_cache_entries(session, map(self.content_hash, texts), self.config.model_version)
+        embeddings = {
+            content_hash: np.asarray(entry.embedding, dtype=np.float32)
+            for content_hash, entry in entries.items()
+            if entry.embedding is not None
+        }
+        hits = sum(self.content_hash(text) in embeddings for text in texts)
+        self.stats["embedding_hits"] += hits
+        self.stats["embedding_misses"] += len(texts) - hits
+        return embeddings
+
+    async def put_titles(self, session: AsyncSession, titles: Dict[str, str]) -> None:
+        """Сохраняет заголовки: ключ — исходный текст поста."""
+        if self.config.enabled:
+            await upsert_cache_titles(
+                session,
+                {self.content_hash(text): title for text, title in titles.items()},
+                self.config.model_version,
+            )
+
+    async def put_embeddings(self, session: AsyncSession, embeddings: Dict[str, np.ndarray]) -> None:
+        """Сохраняет эмбеддинги: ключ — исходный текст поста."""
+        if self.config.enabled:
+            # Колонка кэша — double precision[], в отличие от pgvector она принимает только списки
+            await upsert_cache_embeddings(
+                session,
+                {self.content_hash(text): embedding.tolist() for text, embedding in embeddings.items()},
+                self.config.model_version,
+            )
+
+    async def evict(self, session: AsyncSession) -> int:
+        if not self.config.enabled:
+            return 0
+        return await evict_content_cache(session, self.config.max_size_mb * 1024 * 1024)
+
+
+content_cache = ContentCache(config=main_config.content_cache)
@@ -1,130 +1,273 @@
 import asyncio
 import logging
+import os
+import socket
 from datetime import datetime, timedelta, timezone
+from typing import Dict, List
 
-from crud.channel import get_all_channels_with_subscribers, update_channel_subs_cnt
-from crud.post import create_post, delete_old_posts, get_all_posts, get_posts_by_channel, update_post
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from core.config import main_config
+from core.config.models.daily_post_handler import DailyPostHandlerConfig
+from crud.channel import (
+    get_all_channels_with_subscribers,
+    get_channels,
+    get_channels_digest_freq,
+    get_channels_due_for_refresh,
+    postpone_channel_refresh,
+    update_channel_refresh_schedules,
+)
+from crud.daily_run import (
+    add_daily_run_channels,
+    claim_daily_run,
+    claim_run_channels,
+    finish_ingest_stage,
+    get_daily_run,
+    get_or_create_daily_run,
+    set_daily_run_stage,
+    touch_daily_run_claims,
+)
+from crud.post import (
+    drop_post_partitions_before,
+    ensure_post_partitions,
+    get_posts_without_embedding,
+    get_recent_simhashes,
+    set_post_embeddings,
+)
 from database.db_session_maker import database
+from models.daily_run import RETIRED_RUN_STAGES, RUN_KIND_STAGES, RUN_STAGES, DailyRun
+from models.user import DigestFreq
 from services.aggregator import Aggregator
-from services.channel_handler import get_channel_subscribers_count
-from services.embedder import embedder
-from services.qrag import qrag
-from services.telethon_client import TelethonClient
-from services.title_composer import summarizer
+from services.content_cache import content_cache
+from services.ingestion_pipeline import ChannelProgress, IngestionPipeline, embed_with_cache
+from services.near_duplicates import NearDuplicateIndex
+from services.refresh_scheduler import refresh_scheduler
+from services.telethon_client import TelethonClientPool
 from sqlalchemy.ext.asyncio import AsyncSession
-from telethon.errors import FloodWaitError
-from telethon.types import Message
 
 
 class DailyPostHandler:
-    def __init__(self, telethon_client: TelethonClient, days_to_keep: int = 31):
-        self.tg_client = telethon_client.client
+    def __init__(self, telethon_pool: TelethonClientPool, config: DailyPostHandlerConfig):
+        self.telethon_pool = telethon_pool
         self.logger = logging.getLogger(__name__)
-        self.days_to_keep = days_to_keep
+        self.days_to_keep = config.days_to_keep
+        self.config = config
+        self.work_queue = config.work_queue
+        # Несколько процессов (uvicorn и app/worker.py) делят каналы запуска через очередь в Postgres
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
 
     async def delete_old_posts(self, session: AsyncSession):
-        deleted_count = await delete_old_posts(session, self.days_to_keep)
-        print(f"Deleted {deleted_count} posts older than {self.days_to_keep} days")
+        # Посты хранятся в секциях по published_at: старые секции удаляются целиком,
+        # а секции на ближайшие дни создаются заранее, чтобы новые посты не копились в posts_default
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=self.days_to_keep)
+        created_count = await ensure_post_partitions(
+            session, cutoff, now + timedelta(days=self.config.partitions_ahead_days), self.config.partition_days
+        )
+        dropped_count = await drop_post_partitions_before(session, cutoff)
+        print(
+            f"Created {created_count} post partitions, dropped {dropped_count} partitions "
+            f"older than {self.days_to_keep} days"
+        )
 
-    async def update_and_fetch_posts(self, session: AsyncSession, channels: list):
-        date_to_keep_from = datetime.now(tz=timezone.utc) - timedelta(days=self.days_to_keep)
+    async def update_and_fetch_posts(self, session: AsyncSession, channel_links: List[str], run_id: int | None = None):
+        # Индекс строится на каждую пачку каналов, чтобы учесть посты, сохранённые другими воркерами
+        near_duplicates = await self._load_near_duplicate_index(session)
 
-        for channel in channels:
-            print(f"Processing channel: {channel.channel_link}")
+        # Новые посты проходят потоковый конвейер fetch → filter → summarize → embed → write;
+        # посты и high-water mark каждого канала коммитятся по мере обработки
+        pipeline = IngestionPipeline(self.telethon_pool, self.config, near_duplicates, run_id=run_id)
+        await pipeline.run(channel_links)
 
-            subs_count = await get_channel_subscribers_count(self.tg_client, channel.channel_link)
-            await update_channel_subs_cnt(session, channel.channel_link, subs_count)
-            print(f"Updated subscriber count for channel {channel.channel_link} to {subs_count}")
+        await session.commit()
+        if refresh_scheduler.config.enabled:
+            await self._reschedule_channels(session, pipeline.channel_progress)
+        print("All posts updated and new posts fetched")
 
-            try:
-                # Fetch all messages in one API call within the date range
-                messages = await self._fetch_messages(channel.channel_link, date_to_keep_from)
-                print(f"Fetched {len(messages)} messages from Telegram for channel {channel.channel_link}")
-
-                # Get all existing posts from the database for this channel within the date range
-                existing_posts = await get_posts_by_channel(session=session, channel_link=channel.channel_link)
-                existing_post_links = set(post.post_link for post in existing_posts)
-                print(f"Found {len(existing_posts)} existing posts in the database for channel {channel.channel_link}")
-
-                for message in messages:
-                    post_link = f"t.me/{channel.channel_link}/{message.id}"
-                    if len(message.text) < 300:
-                        continue
-                    if post_link in existing_post_links:
-                        amount_reactions = await self.get_reactions(message)
-                        amount_comments = await self.get_comments(message)
-                        await update_post(
-                            session,
-                            post_link=post_link,
-                            amount_reactions=amount_reactions,
-                            amount_comments=amount_comments,
-                        )
-                    else:
-                        # Create a new post
-                        summary = summarizer.summarize(message.text) if message.text else "No Title"
-                        embedding = embedder.get_embeddings(summary)  # TODO: раскоментить для прода
-                        await create_post(
-                            session=session,
-                            post_link=post_link,
-                            channel_link=channel.channel_link,
-                            title=summary,
-                            published_at=message.date,
-                            amount_reactions=await self.get_reactions(message),
-                            amount_comments=await self.get_comments(message),
-                            embedding=embedding,  # TODO: поменять на embedder
-                            text=message.text,  # TODO: убрать для продакшена
-                        )
-                print(f"Processed messages for channel {channel.channel_link}")
-            except FloodWaitError as e:
-                print(f"Flood wait error for {channel.channel_link}: {e}")
-                await asyncio.sleep(e.seconds)
-            except Exception as e:
-                print(f"Error processing channel {channel.channel_link}: {e}")
+    async def finish_embeddings(self, session: AsyncSession) -> None:
+        await self.delete_old_posts(session)
+        await self.embed_pending_posts(session)
 
-        await session.commit()
+        evicted_count = await content_cache.evict(session)
+        print(f"Content cache stats since start: {content_cache.stats}, evicted {evicted_count} entries")
 
-        all_posts = await get_all_posts(session=session)
-        qrag.build_indexes(
-            posts=[post.text for post in all_posts],
-            embeddings=[post.embedding for post in all_posts],
+    async def embed_pending_posts(self, session: AsyncSession) -> None:
+        """
+        Эмбеддит заголовки всех постов без эмбеддинга, собранных со всех каналов.
+        Посты, которые не удалось обработать, останутся без эмбеддинга и попадут в следующий запуск.
+        """
+        pending_posts = await get_posts_without_embedding(session)
+        if not pending_posts:
+            return
+
+        # Досчитываем эмбеддинги, которые не удалось получить в конвейере
+        vectors = await embed_with_cache(
+            session, [post.text for post in pending_posts], [post.title for post in pending_posts]
         )
+        embeddings = {post.post_link: vector for post, vector in zip(pending_posts, vectors) if vector is not None}
+        await set_post_embeddings(session, embeddings)
+        print(f"Embedded {len(embeddings)} of {len(pending_posts)} pending posts")
 
-        print("All posts updated and new posts fetched")
+    async def _load_near_duplicate_index(self, session: AsyncSession) -> NearDuplicateIndex:
+        near_duplicates = NearDuplicateIndex(config=main_config.near_duplicates)
+        if not near_duplicates.config.enabled:
+            return near_duplicates
 
-    async def _fetch_messages(self, channel_link: str, date_to_keep_from: datetime):
-        messages = []
-        try:
-            # Fetch messages using iter_messages and collect them into a list
-            async for message in self.tg_client.iter_messages(
-                channel_link,
-                reverse=True,
-                offset_date=date_to_keep_from,
-            ):
-                messages.append(message)
-        except Exception as e:
-            print(f"Error fetching messages for {channel_link}: {e}")
-        return messages
+        since = datetime.now(tz=timezone.utc) - timedelta(days=near_duplicates.config.window_days)
+        for post_link, fingerprint, text in await get_recent_simhashes(session, since):
+            if fingerprint is None:
+                # Посты, сохранённые до появления колонки simhash
+                fingerprint = near_duplicates.fingerprint(text)
+            near_duplicates.add(post_link, fingerprint)
+        print(f"Loaded {len(near_duplicates)} posts into the near-duplicate index")
+        return near_duplicates
+
+    async def _reschedule_channels(self, session: AsyncSession, channel_progress: Dict[str, ChannelProgress]) -> None:
+        # Следующее обновление каждого канала планируется по его активности
+        now = datetime.now(tz=timezone.utc)
+        channels = await get_channels(session, list(channel_progress))
+        digest_freqs = await get_channels_digest_freq(session, list(channel_progress))
+        schedules = []
+        for channel in channels:
+            progress = channel_progress[channel.channel_link]
+            if progress.failed or progress.error:
+                schedules.append(refresh_scheduler.retry_schedule(channel, now))
+                continue
+            digest_freq = digest_freqs.get(channel.channel_link, DigestFreq.MONTHLY)
+            schedules.append(refresh_scheduler.schedule(channel, progress.fetched_count, digest_freq, now))
+        await update_channel_refresh_schedules(session, schedules)
 
     async def collect_channels(self, session: AsyncSession):
-        channels = await get_all_channels_with_subscribers(session)
-        print(f"Collected {len(channels)} channels with subscribers")
+        if not refresh_scheduler.config.enabled:
+            channels = await get_all_channels_with_subscribers(session)
+            print(f"Collected {len(channels)} channels with subscribers")
+            return channels
+
+        channels = await get_channels_due_for_refresh(session, datetime.now(tz=timezone.utc))
+        print(f"Collected {len(channels)} channels due for refresh")
         return channels
 
-    async def get_reactions(self, message: Message) -> int:
-        if message.reactions:
-            return sum(reaction.count for reaction in message.reactions.results)
-        return 0
+    async def run_daily_tasks(self):
+        """
+        Выполняет ежедневный запуск вместе с остальными воркерами.
+        Каналы запуска разбираются всеми воркерами через очередь в daily_run_channels,
+        а этапы после загрузки (эмбеддинги, агрегация) выполняет ровно один из них.
+        """
+        # Завершённый запуск засчитывается, только если начат после последнего запуска по расписанию:
+        # скользящее окно засчитало бы и вчерашний запуск после рестарта днём
+        await self._run("daily", since=self._scheduled_daily_start())
+        print("Daily tasks completed")
+
+    @staticmethod
+    def _scheduled_daily_start() -> datetime:
+        # Последний момент срабатывания cron-задачи ежедневного запуска (часовой пояс планировщика — локальный)
+        now = datetime.now().astimezone()
+        scheduled = now.replace(hour=refresh_scheduler.config.aggregation_hour, minute=0, second=0, microsecond=0)
+        if scheduled > now:
+            scheduled -= timedelta(days=1)
+        return scheduled
 
-    async def get_comments(self, message: Message) -> int:
-        if message.replies:
-            return message.replies.replies
-        return 0
+    def add_scheduled_jobs(self, scheduler: AsyncIOScheduler) -> None:
+        # Ежедневный запуск с агрегацией и, если включено, частые тики обновления каналов по расписанию активности
+        scheduler.add_job(self.run_daily_tasks, "cron", hour=refresh_scheduler.config.aggregation_hour, minute=0)
+        if refresh_scheduler.config.enabled:
+            scheduler.add_job(self.run_refresh_tasks, "interval", minutes=refresh_scheduler.config.tick_minutes)
 
-    async def run_daily_tasks(self):
+    async def run_refresh_tasks(self):
+        """
+        Промежуточное обновление каналов, у которых подошло время по расписанию активности.
+        Агрегация перестраивается только ежедневным запуском.
+        """
+        if not refresh_scheduler.config.enabled:
+            return
+        # Тики, запущенные воркерами одновременно, попадают в один запуск
+        since = datetime.now(tz=timezone.utc) - timedelta(minutes=refresh_scheduler.config.tick_minutes / 2)
+        await self._run("refresh", since=since)
+
+    async def _run(self, kind: str, since: datetime) -> None:
+        run = await self._start_or_join_run(kind, since)
+        if run is None:
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(run.id))
+        try:
+            if run.stage == RUN_STAGES[0]:
+                await self._ingest_stage(run.id)
+            await self._run_final_stages(run)
+        finally:
+            heartbeat.cancel()
+
+    async def _start_or_join_run(self, kind: str, since: datetime) -> DailyRun | None:
+        now = datetime.now(tz=timezone.utc)
+        resume_since = now - timedelta(hours=self.config.resume_window_hours)
         async with database.get_session() as session:
-            await self.delete_old_posts(session)
-            channels = await self.collect_channels(session)
-            await self.update_and_fetch_posts(session, channels)
-            aggregator = Aggregator(session)
-            await aggregator.compute_and_store_importance_scores()  # TODO: раскоментить для прода
-        print("Daily tasks completed")
+            run = await get_or_create_daily_run(session, kind, since, resume_since)
+            if run.finished_at is not None:
+                print(f"Run {run.id} ({kind}) already finished at {run.finished_at}")
+                return None
+            if run.stage == RUN_STAGES[0]:
+                # Каналы, добавленные после старта запуска, тоже попадают в очередь
+                channel_links = [channel.channel_link for channel in await self.collect_channels(session)]
+                await add_daily_run_channels(session, run.id, channel_links)
+                if refresh_scheduler.config.enabled:
+                    # Пока канал в очереди, следующие тики его не берут; после обработки расписание пересчитывается
+                    await postpone_channel_refresh(
+                        session, channel_links, now + timedelta(hours=self.config.resume_window_hours)
+                    )
+        print(f"Worker {self.worker_id} joined run {run.id} ({kind}) at stage {run.stage}")
+        return run
+
+    async def _ingest_stage(self, run_id: int) -> None:
+        """
+        Забирает каналы из очереди запуска пачками, пока все каналы не будут обработаны.
+        Воркер без работы ждёт остальных, чтобы подобрать каналы упавших воркеров по истечении lease.
+        """
+        while True:
+            async with database.get_session() as session:
+                channel_links = await claim_run_channels(
+                    session, run_id, self.worker_id, self.work_queue.claim_batch_size, self.work_queue.lease_seconds
+                )
+                if channel_links:
+                    print(f"Worker {self.worker_id} claimed {len(channel_links)} channels of run {run_id}")
+                    await self.update_and_fetch_posts(session, channel_links, run_id)
+                    continue
+                if await finish_ingest_stage(session, run_id, self.worker_id):
+                    print(f"All channels of run {run_id} processed")
+                    return
+                run = await get_daily_run(session, run_id)
+                if run.stage != RUN_STAGES[0]:
+                    return
+            await asyncio.sleep(self.work_queue.poll_seconds)
+
+    async def _run_final_stages(self, run: DailyRun) -> None:
+        stage_handlers = {
+            "embed": self.finish_embeddings,
+            "aggregate": self._aggregate_stage,
+        }
+        async with database.get_session() as session:
+            stage = await claim_daily_run(session, run.id, self.worker_id, self.work_queue.lease_seconds)
+        if stage is None:
+            print(f"Final stages of run {run.id} are handled by another worker")
+            return
+        stage = RETIRED_RUN_STAGES.get(stage, stage)
+
+        # Каждый этап коммитит свои результаты и отмечается в daily_runs, поэтому после рестарта
+        # запуск продолжается с первого незавершённого этапа
+        stages = RUN_KIND_STAGES[run.kind]
+        for idx in range(stages.index(stage), len(stages) - 1):
+            print(f"Run {run.id} ({run.kind}): stage {stages[idx]}")
+            async with database.get_session() as session:
+                await stage_handlers[stages[idx]](session)
+                await set_daily_run_stage(session, run.id, self.worker_id, stages[idx + 1])
+        print(f"Run {run.id} ({run.kind}) finished")
+
+    async def _heartbeat(self, run_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.work_queue.heartbeat_seconds)
+            try:
+                async with database.get_session() as session:
+                    await touch_daily_run_claims(session, run_id, self.worker_id)
+            except Exception as e:
+                print(f"Heartbeat for run {run_id} failed: {e}")
+
+    async def _aggregate_stage(self, session: AsyncSession) -> None:
+        aggregator = Aggregator(session)
+        await aggregator.compute_and_store_importance_scores()  # TODO: раскоментить для прода
@@ -1,20 +1,64 @@
-from typing import List
+import asyncio
+import logging
+from typing import List, Optional
 
 import numpy as np
 from core.config import main_config
+from core.config.models.embedder import EmbedderConfig
 from langchain_community.embeddings.gigachat import GigaChatEmbeddings
 
+logger = logging.getLogger(__name__)
+
 
 class GigaEmbedder:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, config: EmbedderConfig):
         self.embedder = GigaChatEmbeddings(credentials=api_key, verify_ssl_certs=False)
+        self.config = config
+        self._semaphore = asyncio.Semaphore(config.max_concurrency)
 
-    def get_embeddings(self, texts: str | List[str]) -> List[List[float]]:
+    def get_embeddings(self, texts: str | List[str]) -> np.ndarray:
         if isinstance(texts, str):
             texts = [texts]
 
-        texts = [text[:512] for text in texts]
-        return np.array(self.embedder.embed_documents(texts=texts))
+        texts = self._prepare(texts)
+        return np.asarray(self.embedder.embed_documents(texts=texts), dtype=np.float32)
+
+    async def aembed(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Эмбеддит тексты пачками по batch_size через aembed_documents.
+        Возвращает список той же длины, что и texts; для текстов, которые не удалось
+        обработать даже после повторов, на их месте стоит None.
+        """
+        texts = self._prepare(texts)
+        batches = [texts[i : i + self.config.batch_size] for i in range(0, len(texts), self.config.batch_size)]
+        results = await asyncio.gather(*(self._aembed_batch(batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def _aembed_batch(self, texts: List[str], attempts: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        attempts = self.config.max_retries if attempts is None else attempts
+        for attempt in range(attempts):
+            try:
+                async with self._semaphore:
+                    vectors = await self.embedder.aembed_documents(texts=texts)
+                return list(np.asarray(vectors, dtype=np.float32))
+            except Exception as e:
+                logger.warning(f"Embedding batch of {len(texts)} texts failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < attempts:
+                    await asyncio.sleep(self.config.retry_delay_seconds * 2**attempt)
+
+        if len(texts) == 1:
+            return [None]
+
+        # Делим пачку пополам, чтобы один проблемный текст не лишал эмбеддингов остальные.
+        # Временные сбои уже исключены повторами всей пачки, поэтому половины пробуются по одному разу
+        middle = len(texts) // 2
+        left, right = await asyncio.gather(
+            self._aembed_batch(texts[:middle], attempts=1), self._aembed_batch(texts[middle:], attempts=1)
+        )
+        return left + right
+
+    def _prepare(self, texts: List[str]) -> List[str]:
+        return [text[: self.config.max_text_chars] for text in texts]
 
 
-embedder = GigaEmbedder(api_key=main_config.giga_key)
+embedder = GigaEmbedder(api_key=main_config.giga_key, config=main_config.embedder)
@@ -0,0 +1,557 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from core.config.models.daily_post_handler import DailyPostHandlerConfig
+from crud.channel import get_channel, update_channel_last_message, update_channel_subs_cnt
+from crud.daily_run import set_run_channel_status
+from crud.post import (
+    get_latest_post_by_channel,
+    get_post_links_by_channel,
+    get_posts_by_links,
+    update_posts_engagement,
+    upsert_posts,
+)
+from database.db_session_maker import database
+from services.channel_handler import get_channel_subscribers_count, resolve_channel_entity
+from services.content_cache import content_cache
+from services.embedder import embedder
+from services.near_duplicates import NearDuplicateIndex
+from services.telethon_client import TelethonClient, TelethonClientPool
+from services.title_composer import summarizer
+from sqlalchemy.ext.asyncio import AsyncSession
+from telethon.errors import FloodWaitError
+from telethon.tl.types import InputPeerChannel
+from telethon.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Маркер завершения стадии: каждый воркер следующей стадии получает свой STOP
+STOP = object()
+
+MIN_POST_LENGTH = 300
+
+
+@dataclass
+class ChannelProgress:
+    channel_link: str
+    known_post_links: set = field(default_factory=set)
+    # Аккаунт пула, через который сейчас читается канал, и сущность канала для этого аккаунта
+    client: Optional[TelethonClient] = None
+    entity: Optional[InputPeerChannel] = None
+    last_message_id: Optional[int] = None
+    last_message_date: Optional[datetime] = None
+    # Сколько новых сообщений прочитано за запуск (для оценки активности канала)
+    fetched_count: int = 0
+    # Сколько прочитанных сообщений канала ещё не дошли до конца конвейера
+    pending: int = 0
+    # Подписчики, известные посты и реакции уже обновлены (не повторяется после FloodWaitError)
+    prepared: bool = False
+    fetch_done: bool = False
+    # Ошибка на стадиях после загрузки: high-water mark в этом случае не сдвигается
+    failed: bool = False
+    # Причина, по которой чтение канала остановилось раньше времени
+    error: Optional[str] = None
+    # Статус канала в запуске уже записан
+    finished: bool = False
+    drained: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def add_pending(self) -> None:
+        self.pending += 1
+
+    def complete_one(self) -> None:
+        self.pending -= 1
+        self._check_drained()
+
+    def mark_fetched(self) -> None:
+        self.fetch_done = True
+        self._check_drained()
+
+    def _check_drained(self) -> None:
+        if self.fetch_done and self.pending == 0:
+            self.drained.set()
+
+
+@dataclass
+class PendingPost:
+    progress: ChannelProgress
+    message: Message
+    row: Optional[Dict] = None
+
+    @property
+    def post_link(self) -> str:
+        return f"t.me/{self.progress.channel_link}/{self.message.id}"
+
+
+async def embed_with_cache(session: AsyncSession, texts: List[str], titles: List[str]) -> List[Optional[np.ndarray]]:
+    """
+    Возвращает эмбеддинги заголовков (float32), беря из кэша те, что уже считались для такого же текста поста.
+    Для заголовков, которые не удалось обработать, возвращается None.
+    """
+    cached_embeddings = await content_cache.get_embeddings(session, texts)
+    missing = [idx for idx, text in enumerate(texts) if content_cache.content_hash(text) not in cached_embeddings]
+
+    vectors = await embedder.aembed([titles[idx] for idx in missing])
+    fresh_embeddings = {texts[idx]: vector for idx, vector in zip(missing, vectors) if vector is not None}
+    await content_cache.put_embeddings(session, fresh_embeddings)
+
+    embeddings = []
+    for text in texts:
+        cached = cached_embeddings.get(content_cache.content_hash(text))
+        embeddings.append(cached if cached is not None else fresh_embeddings.get(text))
+    return embeddings
+
+
+class IngestionPipeline:
+    """
+    Потоковая загрузка новых постов: fetch → filter → summarize → embed → write.
+    Стадии связаны очередями ограниченного размера, поэтому память не зависит от размера канала,
+    а чтение из Telegram идёт одновременно с запросами к GigaChat и записью в БД.
+    """
+
+    def __init__(
+        self,
+        telethon_pool: TelethonClientPool,
+        config: DailyPostHandlerConfig,
+        near_duplicates: NearDuplicateIndex,
+        run_id: int | None = None,
+    ):
+        self.telethon_pool = telethon_pool
+        # Свой индекс у каждого конвейера: запуски в одном процессе могут идти одновременно
+        self.near_duplicates = near_duplicates
+        # Запуск, в котором отмечается статус каждого канала (см. models.daily_run)
+        self.run_id = run_id
+        self.config = config.pipeline
+        self.days_to_keep = config.days_to_keep
+        self.max_concurrent_channels = config.max_concurrent_channels
+        self.engagement_hot_days = config.engagement_hot_days
+        self.subscribers_ttl_hours = config.subscribers_ttl_hours
+        self.flood_wait = config.flood_wait
+
+        self.queues: Dict[str, asyncio.Queue] = {
+            name: asyncio.Queue(maxsize=self.config.queue_size)
+            for name in ("fetched", "filtered", "summarized", "embedded")
+        }
+        self.peak_queue_depths: Dict[str, int] = dict.fromkeys(self.queues, 0)
+        # Итоги обработки каждого канала после run()
+        self.channel_progress: Dict[str, ChannelProgress] = {}
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {name: queue.qsize() for name, queue in self.queues.items()}
+
+    async def run(self, channel_links: List[str]) -> None:
+        date_to_keep_from = datetime.now(tz=timezone.utc) - timedelta(days=self.days_to_keep)
+        semaphore = asyncio.Semaphore(self.max_concurrent_channels)
+
+        # Каждая стадия — (воркеры, очередь, в которую они пишут)
+        stages = [
+            (
+                [self._fetch_channel_with_backoff(semaphore, link, date_to_keep_from) for link in channel_links],
+                "fetched",
+            ),
+            ([self._filter_worker()], "filtered"),
+            ([self._summarize_worker() for _ in range(self.config.summarize_workers)], "summarized"),
+            ([self._embed_worker() for _ in range(self.config.embed_workers)], "embedded"),
+            ([self._write_worker()], None),
+        ]
+
+        stage_tasks = [
+            asyncio.create_task(
+                self._run_stage(workers, output, len(stages[idx + 1][0]) if output else 0, fail_fast=idx > 0)
+            )
+            for idx, (workers, output) in enumerate(stages)
+        ]
+        monitor = asyncio.create_task(self._monitor_queues())
+        try:
+            await asyncio.gather(*stage_tasks)
+        except Exception as e:
+            # Упал воркер стадии после загрузки: его посты уже не дойдут до записи, и каналы не завершатся.
+            # Конвейер останавливается, а каналы отмечаются упавшими, чтобы не держать их claim до конца lease
+            for task in stage_tasks:
+                task.cancel()
+            await asyncio.gather(*stage_tasks, return_exceptions=True)
+            await self._fail_unfinished_channels(channel_links, f"Ingestion pipeline failed: {e}")
+            raise
+        finally:
+            monitor.cancel()
+        print(f"Ingestion pipeline finished, peak queue depths: {self.peak_queue_depths}")
+
+    async def _run_stage(
+        self, workers: list, output: Optional[str], downstream_workers: int, fail_fast: bool = False
+    ) -> None:
+        """
+        Ждёт воркеров стадии и передаёт STOP следующей стадии.
+        fail_fast — ошибка воркера останавливает стадию и поднимается дальше; иначе она только логируется,
+        а следующая стадия всё равно получает STOP.
+        """
+        tasks = [asyncio.create_task(worker) for worker in workers]
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=not fail_fast)
+        finally:
+            # При ошибке или отмене стадии остальные её воркеры тоже останавливаются
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Ingestion worker failed", exc_info=result)
+        for _ in range(downstream_workers):
+            await self.queues[output].put(STOP)
+
+    async def _put(self, queue_name: str, item: PendingPost) -> None:
+        queue = self.queues[queue_name]
+        await queue.put(item)
+        self.peak_queue_depths[queue_name] = max(self.peak_queue_depths[queue_name], queue.qsize())
+
+    async def _next_batch(self, queue_name: str, max_size: int) -> Tuple[List[PendingPost], bool]:
+        """
+        Ждёт первый элемент и добирает пачку до max_size в течение batch_linger_seconds.
+        Второй элемент результата — получен ли STOP.
+        """
+        queue = self.queues[queue_name]
+        item = await queue.get()
+        if item is STOP:
+            return [], True
+
+        batch = [item]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.config.batch_linger_seconds
+        while len(batch) < max_size:
+            timeout = deadline - loop.time()
+            try:
+                item = queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _monitor_queues(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.monitor_interval_seconds)
+            print(f"Ingestion queue depths: {self.queue_depths()}")
+
+    # --- fetch ---
+
+    async def _fetch_channel_with_backoff(
+        self, semaphore: asyncio.Semaphore, channel_link: str, date_to_keep_from: datetime
+    ) -> None:
+        """
+        Читает новые сообщения канала, повторяя попытку после FloodWaitError.
+        Ожидание происходит вне семафора, поэтому остальные каналы продолжают читаться.
+        Повторная попытка продолжает чтение с последнего уже отправленного в конвейер сообщения.
+        """
+        progress = ChannelProgress(channel_link)
+        self.channel_progress[channel_link] = progress
+        for attempt in range(self.flood_wait.max_retries + 1):
+            try:
+                async with semaphore:
+                    await self._fetch_channel(progress, date_to_keep_from)
+                break
+            except FloodWaitError as e:
+                # Аккаунт уходит на паузу, канал продолжается другим аккаунтом пула, если такой свободен
+                self.telethon_pool.report_flood_wait(progress.client, e.seconds)
+                delay = self.telethon_pool.wait_time(channel_link)
+                if attempt == self.flood_wait.max_retries or delay > self.flood_wait.max_wait_seconds:
+                    print(f"Flood wait error for {channel_link}: {e}. Skipping channel until the next run")
+                    progress.error = f"Flood wait: {e}"
+                    break
+                if delay > 0:
+                    delay += self.flood_wait.extra_delay_seconds
+                    print(f"Flood wait error for {channel_link}: {e}. All accounts busy, retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                else:
+                    print(f"Flood wait error for {channel_link} on {progress.client.session_name}: switching account")
+            except Exception as e:
+                logger.exception(f"Error processing channel {channel_link}")
+                progress.error = str(e)
+                break
+
+        progress.mark_fetched()
+        await self._finalize_channel(progress)
+
+    async def _fetch_channel(self, progress: ChannelProgress, date_to_keep_from: datetime) -> None:
+        channel_link = progress.channel_link
+        client = self.telethon_pool.get_client(channel_link)
+        async with database.get_session() as session:
+            if client is not progress.client:
+                # access_hash свой у каждого аккаунта; берётся из БД, без повторного ResolveUsername
+                progress.client = client
+                progress.entity = await resolve_channel_entity(client, session, channel_link)
+                if progress.entity is None:
+                    print(f"Channel {channel_link} cannot be resolved, skipping")
+                    progress.error = "Channel cannot be resolved"
+                    return
+
+            if not progress.prepared:
+                print(f"Processing channel: {channel_link} via {client.session_name}")
+                await self._refresh_subscribers_if_stale(session, progress)
+
+                progress.known_post_links = set(await get_post_links_by_channel(session, channel_link))
+                # Реакции и комментарии обновляются отдельно и только у «горячих» постов, где они ещё меняются
+                await self._refresh_engagement(session, progress)
+                progress.prepared = True
+
+            # Читаем из Telegram только сообщения новее high-water mark канала
+            min_id = progress.last_message_id or await self._get_high_water_mark(session, channel_link)
+
+        fetched_count = 0
+        async for message in progress.client.client.iter_messages(
+            progress.entity,
+            reverse=True,
+            offset_date=date_to_keep_from,
+            min_id=min_id or 0,
+        ):
+            progress.last_message_id = message.id
+            progress.last_message_date = message.date
+            progress.add_pending()
+            await self._put("fetched", PendingPost(progress, message))
+            progress.fetched_count += 1
+            fetched_count += 1
+        print(f"Fetched {fetched_count} new messages from Telegram for channel {channel_link} (min_id={min_id})")
+
+    async def _finalize_channel(self, progress: ChannelProgress) -> None:
+        # Сдвигаем high-water mark только после того, как все прочитанные сообщения сохранены
+        await progress.drained.wait()
+        if progress.failed:
+            await self._set_run_channel_status(progress.channel_link, "failed", "Some posts were not saved")
+            progress.finished = True
+            return
+        if progress.last_message_id is not None:
+            async with database.get_session() as session:
+                await update_channel_last_message(
+                    session, progress.channel_link, progress.last_message_id, progress.last_message_date
+                )
+        await self._set_run_channel_status(
+            progress.channel_link, "failed" if progress.error else "done", progress.error
+        )
+        progress.finished = True
+        print(f"Processed new messages for channel {progress.channel_link}")
+
+    async def _fail_unfinished_channels(self, channel_links: List[str], error: str) -> None:
+        # Упавшие каналы запуска не ждут истечения lease: их high-water mark не сдвигается, и посты дочитаются позже
+        for channel_link in channel_links:
+            progress = self.channel_progress.setdefault(channel_link, ChannelProgress(channel_link))
+            if progress.finished:
+                continue
+            progress.failed = True
+            progress.error = error
+            try:
+                await self._set_run_channel_status(channel_link, "failed", error)
+            except Exception:
+                logger.exception(f"Cannot mark channel {channel_link} of run {self.run_id} as failed")
+
+    async def _set_run_channel_status(self, channel_link: str, status: str, error: str | None = None) -> None:
+        if self.run_id is None:
+            return
+        async with database.get_session() as session:
+            await set_run_channel_status(session, self.run_id, channel_link, status, error)
+
+    async def _get_high_water_mark(self, session: AsyncSession, channel_link: str) -> int | None:
+        channel = await get_channel(session, channel_link)
+        if channel and channel.last_message_id is not None:
+            return channel.last_message_id
+
+        # Для каналов без сохранённой метки берём последний пост из БД
+        latest_post = await get_latest_post_by_channel(session, channel_link)
+        if latest_post:
+            return message_id_from_link(latest_post.post_link)
+        return None
+
+    async def _refresh_subscribers_if_stale(self, session: AsyncSession, progress: ChannelProgress) -> None:
+        channel_link = progress.channel_link
+        # GetFullChannelRequest сильно ограничен по частоте, поэтому число подписчиков обновляется раз в TTL
+        channel = await get_channel(session, channel_link)
+        stale_before = datetime.now(tz=timezone.utc) - timedelta(hours=self.subscribers_ttl_hours)
+        if channel and channel.subs_updated_at is not None and channel.subs_updated_at > stale_before:
+            return
+
+        subs_count = await get_channel_subscribers_count(progress.client, session, channel_link)
+        if subs_count is not None:
+            await update_channel_subs_cnt(session, channel_link, subs_count)
+            print(f"Updated subscriber count for channel {channel_link} to {subs_count}")
+
+    async def _refresh_engagement(self, session: AsyncSession, progress: ChannelProgress) -> None:
+        channel_link = progress.channel_link
+        hot_since = datetime.now(tz=timezone.utc) - timedelta(days=self.engagement_hot_days)
+        hot_post_links = await get_post_links_by_channel(session, channel_link, since=hot_since)
+        message_ids = [message_id_from_link(post_link) for post_link in hot_post_links]
+        if not message_ids:
+            return
+
+        # get_messages(ids=...) запрашивает сообщения пачками по 100, без перечитывания всей истории канала
+        messages = await progress.client.client.get_messages(progress.entity, ids=message_ids)
+        engagement = [
+            (f"t.me/{channel_link}/{message.id}", get_reactions(message), get_comments(message))
+            for message in messages
+            if message is not None  # Сообщение удалено из канала
+        ]
+        updated_count = await update_posts_engagement(session, engagement, since=hot_since)
+        print(f"Refreshed engagement for {updated_count} hot posts of channel {channel_link}")
+
+    # --- filter ---
+
+    async def _filter_worker(self) -> None:
+        while (item := await self.queues["fetched"].get()) is not STOP:
+            text = getattr(item.message, "text", None)
+            # Служебные сообщения, медиа без подписи, короткие и уже сохранённые посты пропускаются
+            if not text or len(text) < MIN_POST_LENGTH or item.post_link in item.progress.known_post_links:
+                item.progress.complete_one()
+                continue
+            await self._put("filtered", item)
+
+    # --- summarize ---
+
+    async def _summarize_worker(self) -> None:
+        async with database.get_session() as session:
+            stopped = False
+            while not stopped:
+                batch, stopped = await self._next_batch("filtered", self.config.summarize_batch_size)
+                if not batch:
+                    continue
+                try:
+                    rows = await self._prepare_rows(session, batch)
+                except Exception:
+                    await self._fail_batch(session, batch, "summarize")
+                    continue
+                for item, row in zip(batch, rows):
+                    item.row = row
+                    await self._put("summarized", item)
+
+    async def _prepare_rows(self, session: AsyncSession, batch: List[PendingPost]) -> List[Dict]:
+        """
+        Готовит строки постов для записи.
+        Почти дубли уже сохранённых постов переиспользуют их заголовок и эмбеддинг вместо вызова GigaChat.
+        """
+        texts = [item.message.text for item in batch]
+        fingerprints = [self.near_duplicates.fingerprint(text) for text in texts]
+        if self.near_duplicates.config.enabled:
+            candidates = [self.near_duplicates.find(fingerprint) for fingerprint in fingerprints]
+        else:
+            candidates = [[] for _ in batch]
+
+        candidate_links = list({post_link for post_candidates in candidates for post_link in post_candidates})
+        originals = {post.post_link: post for post in await get_posts_by_links(session, candidate_links) if post.title}
+        # Оригинал — ближайший кандидат, подтверждённый по тексту; без него пост суммаризируется как обычный
+        matches = [
+            next(
+                (
+                    post_link
+                    for post_link in post_candidates
+                    if post_link in originals and self.near_duplicates.is_duplicate(text, originals[post_link].text)
+                ),
+                None,
+            )
+            for text, post_candidates in zip(texts, candidates)
+        ]
+        for item, fingerprint in zip(batch, fingerprints):
+            self.near_duplicates.add(item.post_link, fingerprint)
+
+        texts_to_summarize = [text for text, match in zip(texts, matches) if match is None]
+        summaries = iter(await self._summarize(session, texts_to_summarize))
+        if len(texts_to_summarize) < len(batch):
+            print(f"Reused titles of {len(batch) - len(texts_to_summarize)} near-duplicate posts")
+
+        rows = []
+        for item, fingerprint, match in zip(batch, fingerprints, matches):
+            original = originals.get(match)
+            rows.append(
+                {
+                    "post_link": item.post_link,
+                    "channel_link": item.progress.channel_link,
+                    "text": item.message.text,  # TODO: убрать для продакшена
+                    "title": original.title if original else next(summaries),
+                    "embedding": original.embedding if original else None,
+                    "simhash": fingerprint,
+                    "amount_reactions": get_reactions(item.message),
+                    "amount_comments": get_comments(item.message),
+                    "published_at": item.message.date,
+                }
+            )
+        return rows
+
+    async def _summarize(self, session: AsyncSession, texts: List[str]) -> List[str]:
+        # Одинаковые тексты (репосты, кросспосты) берутся из кэша, остальные суммаризируются пачками
+        titles = await content_cache.get_titles(session, texts)
+        missing_texts = list(
+            {
+                content_cache.content_hash(text): text
+                for text in texts
+                if content_cache.content_hash(text) not in titles
+            }.values()
+        )
+        if missing_texts:
+            fresh_titles = await summarizer.asummarize_batch(missing_texts)
+            await content_cache.put_titles(session, dict(zip(missing_texts, fresh_titles)))
+            titles.update((content_cache.content_hash(text), title) for text, title in zip(missing_texts, fresh_titles))
+        return [titles[content_cache.content_hash(text)] for text in texts]
+
+    # --- embed ---
+
+    async def _embed_worker(self) -> None:
+        async with database.get_session() as session:
+            stopped = False
+            while not stopped:
+                batch, stopped = await self._next_batch("summarized", self.config.embed_batch_size)
+                to_embed = [item for item in batch if item.row["embedding"] is None]
+                if to_embed:
+                    try:
+                        embeddings = await embed_with_cache(
+                            session, [item.row["text"] for item in to_embed], [item.row["title"] for item in to_embed]
+                        )
+                    except Exception:
+                        # Пост будет сохранён без эмбеддинга и досчитан в embed_pending_posts
+                        logger.exception(f"Embedding stage failed for {len(to_embed)} posts")
+                        await session.rollback()
+                        embeddings = [None] * len(to_embed)
+                    for item, embedding in zip(to_embed, embeddings):
+                        item.row["embedding"] = embedding
+                for item in batch:
+                    await self._put("embedded", item)
+
+    # --- write ---
+
+    async def _write_worker(self) -> None:
+        async with database.get_session() as session:
+            stopped = False
+            while not stopped:
+                batch, stopped = await self._next_batch("embedded", self.config.write_batch_size)
+                if not batch:
+                    continue
+                try:
+                    # Пачка пишется одним INSERT ... ON CONFLICT и одним коммитом
+                    await upsert_posts(session, [item.row for item in batch])
+                except Exception:
+                    await self._fail_batch(session, batch, "write")
+                    continue
+                for item in batch:
+                    item.progress.known_post_links.add(item.post_link)
+                    item.progress.complete_one()
+
+    async def _fail_batch(self, session: AsyncSession, batch: List[PendingPost], stage: str) -> None:
+        # Вызывается из блока except: logger.exception пишет текущее исключение
+        logger.exception(f"Ingestion {stage} stage failed for {len(batch)} posts")
+        await session.rollback()
+        for item in batch:
+            item.progress.failed = True
+            item.progress.complete_one()
+
+
+def message_id_from_link(post_link: str) -> int:
+    return int(post_link.rsplit("/", 1)[-1])
+
+
+def get_reactions(message: Message) -> int:
+    if message.reactions:
+        return sum(reaction.count for reaction in message.reactions.results)
+    return 0
+
+
+def get_comments(message: Message) -> int:
+    if message.replies:
+        return message.replies.replies
+    return 0
@@ -0,0 +1,100 @@
+import hashlib
+import re
+from typing import List, Set
+
+import numpy as np
+from core.config.models.near_duplicates import NearDuplicatesConfig
+
+WORD_PATTERN = re.compile(r"\w+")
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def shingles(text: str, shingle_size: int = 3) -> List[str]:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        return [" ".join(words)]
+    return [" ".join(words[i : i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+
+def jaccard(left: Set[str], right: Set[str]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64-битный SimHash по шинглам из shingle_size слов.
+    Возвращает знаковое число, чтобы его можно было хранить в BIGINT.
+    """
+    text_shingles = shingles(text, shingle_size)
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+            for shingle in text_shingles
+        ],
+        dtype=np.uint64,
+    )
+    # Матрица битов (шинглы x 64), каждый бит голосует +1 или -1
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = (2 * bits.astype(np.int32) - 1).sum(axis=0)
+    fingerprint = np.packbits(votes > 0, bitorder="little").view(np.uint64)[0]
+    return int(fingerprint.astype(np.int64))
+
+
+class NearDuplicateIndex:
+    """
+    Индекс SimHash-отпечатков для поиска почти одинаковых постов.
+    Отпечатки хранятся в одном массиве uint64, поиск — векторизованный подсчёт расстояния Хэмминга
+    до всех отпечатков: 100 тысяч постов занимают 800 КБ, а один запрос выполняется за миллисекунды.
+    """
+
+    def __init__(self, config: NearDuplicatesConfig):
+        self.config = config
+        self._fingerprints = np.empty(0, dtype=np.uint64)
+        self._post_links: List[str] = []
+        self._pending: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._post_links)
+
+    def fingerprint(self, text: str) -> int:
+        return simhash(text, self.config.shingle_size)
+
+    def is_duplicate(self, text: str, original_text: str) -> bool:
+        """
+        Подтверждает совпадение по SimHash сравнением множеств шинглов: близкие отпечатки бывают
+        и у разных постов с общими фразами, а дубль получает заголовок и эмбеддинг оригинала без проверки.
+        """
+        similarity = jaccard(
+            set(shingles(text, self.config.shingle_size)), set(shingles(original_text, self.config.shingle_size))
+        )
+        return similarity >= self.config.min_jaccard
+
+    def add(self, post_link: str, fingerprint: int) -> None:
+        self._post_links.append(post_link)
+        self._pending.append(fingerprint)
+
+    def find(self, fingerprint: int) -> List[str]:
+        """
+        Возвращает ссылки на посты в пределах max_hamming_distance, от ближайшего, не больше max_candidates.
+        Радиус широкий, чтобы находить репосты с правками, поэтому кандидатов подтверждает is_duplicate.
+        Перебор всех отпечатков точный: в радиус попадают все кандидаты, а не только найденные по таблицам.
+        """
+        self._flush()
+        if not len(self._fingerprints):
+            return []
+
+        query = np.array([fingerprint], dtype=np.int64).view(np.uint64)
+        xored = np.bitwise_xor(self._fingerprints, query)
+        distances = POPCOUNT_TABLE[xored.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+        within = np.flatnonzero(distances <= self.config.max_hamming_distance)
+        nearest = within[np.argsort(distances[within], kind="stable")][: self.config.max_candidates]
+        return [self._post_links[idx] for idx in nearest.tolist()]
+
+    def _flush(self) -> None:
+        # Новые отпечатки копятся в списке и переносятся в массив одной операцией перед поиском
+        if self._pending:
+            pending = np.array(self._pending, dtype=np.int64).view(np.uint64)
+            self._fingerprints = np.concatenate([self._fingerprints, pending])
+            self._pending = []
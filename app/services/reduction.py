@@ -0,0 +1,53 @@
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+from core.config.models.reduction import ReductionConfig
+
+
+def fit_projection(vectors: np.ndarray, config: ReductionConfig) -> Tuple[Optional[np.ndarray], float]:
+    """
+    Подбирает матрицу проекции (исходная размерность x config.dim) по выборке vectors.
+    Возвращает матрицу и долю сохранённой энергии векторов (суммы квадратов норм): для PCA — доля
+    объяснённой энергии, для случайной проекции — сохранение норм, около 1.
+    Если понижение выключено или не нужно, матрица — None, а доля — 1.
+    """
+    count, dim = vectors.shape
+    if not config.enabled or config.dim >= dim or count == 0:
+        return None, 1.0
+
+    rng = np.random.default_rng(config.seed)
+    sample = vectors[np.sort(rng.choice(count, min(count, config.fit_sample), replace=False))].astype(np.float64)
+    if config.method == "pca":
+        # Собственные векторы матрицы Грама без центрирования: лучшая по сумме квадратов проекция,
+        # сохраняющая скалярные произведения и косинусные расстояния
+        eigenvalues, eigenvectors = np.linalg.eigh(sample.T @ sample)
+        projection = eigenvectors[:, ::-1][:, : config.dim]
+    elif config.method == "random":
+        projection = rng.standard_normal((dim, config.dim)) / np.sqrt(config.dim)
+    else:
+        raise ValueError(f"Unknown reduction method: {config.method}")
+
+    retained = float(np.square(sample @ projection).sum() / max(np.square(sample).sum(), 1e-12))
+    return projection.astype(np.float32), retained
+
+
+def project(vectors: np.ndarray, projection: Optional[np.ndarray]) -> np.ndarray:
+    if projection is None:
+        return vectors
+    return np.ascontiguousarray(vectors @ projection, dtype=np.float32)
+
+
+def search_recall(vectors: np.ndarray, reduced: np.ndarray, config: ReductionConfig) -> float:
+    """
+    recall@k поиска по сжатым векторам относительно точного поиска по исходным на случайных постах.
+    """
+    count = len(vectors)
+    k = min(config.recall_k, count)
+    if k == 0:
+        return 1.0
+    queries = np.random.default_rng(config.seed).choice(count, min(count, config.recall_queries), replace=False)
+    _, exact = faiss.knn(np.ascontiguousarray(vectors[queries]), np.ascontiguousarray(vectors), k)
+    _, approximate = faiss.knn(reduced[queries], reduced, k)
+    hits = sum(len(set(row_exact) & set(row_approximate)) for row_exact, row_approximate in zip(exact, approximate))
+    return hits / (len(queries) * k)
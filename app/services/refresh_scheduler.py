@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+
+from core.config import main_config
+from core.config.models.refresh_scheduler import RefreshSchedulerConfig
+from models.channel import Channel
+from models.user import DigestFreq
+
+
+class RefreshScheduler:
+    """
+    Расписание обновления каналов по их активности.
+    Частота сообщений канала оценивается скользящим средним по наблюдениям каждого обновления;
+    интервал подбирается так, чтобы к обновлению набиралось около target_posts_per_refresh сообщений,
+    но не дольше, чем допускает самая частая рассылка среди подписчиков канала.
+    """
+
+    def __init__(self, config: RefreshSchedulerConfig, days_to_keep: int):
+        self.config = config
+        self.days_to_keep = days_to_keep
+
+    def schedule(self, channel: Channel, fetched_count: int, digest_freq: DigestFreq, now: datetime) -> Dict:
+        """Новое расписание канала после успешного обновления, в котором прочитано fetched_count сообщений."""
+        if channel.refreshed_at is None:
+            # Первое обновление читает всю историю за days_to_keep дней
+            elapsed_days = self.days_to_keep
+        else:
+            elapsed_days = max((now - channel.refreshed_at).total_seconds() / 86400, 1 / 1440)
+        observed = fetched_count / elapsed_days
+
+        if channel.posts_per_day is None:
+            posts_per_day = observed
+        else:
+            posts_per_day = self.config.ema_alpha * observed + (1 - self.config.ema_alpha) * channel.posts_per_day
+
+        return {
+            "channel_link": channel.channel_link,
+            "posts_per_day": posts_per_day,
+            "refreshed_at": now,
+            "next_refresh_at": now + self.interval(posts_per_day, digest_freq),
+        }
+
+    def retry_schedule(self, channel: Channel, now: datetime) -> Dict:
+        # Обновление не удалось: частоту не трогаем и пробуем снова через минимальный интервал
+        return {
+            "channel_link": channel.channel_link,
+            "posts_per_day": channel.posts_per_day,
+            "refreshed_at": channel.refreshed_at,
+            "next_refresh_at": now + timedelta(minutes=self.config.min_interval_minutes),
+        }
+
+    def interval(self, posts_per_day: float, digest_freq: DigestFreq) -> timedelta:
+        min_hours = self.config.min_interval_minutes / 60
+        max_hours = (
+            self.config.max_interval_hours_weekly
+            if digest_freq == DigestFreq.WEEKLY
+            else self.config.max_interval_hours_monthly
+        )
+        if posts_per_day > 0:
+            hours = self.config.target_posts_per_refresh / posts_per_day * 24
+        else:
+            hours = max_hours
+
+        hours *= random.uniform(1 - self.config.jitter, 1 + self.config.jitter)
+        return timedelta(hours=min(max(hours, min_hours), max_hours))
+
+
+refresh_scheduler = RefreshScheduler(main_config.refresh_scheduler, main_config.daily_post_handler.days_to_keep)
@@ -1,20 +1,29 @@
+import asyncio
+import hashlib
+from typing import List
+
 from core.config import main_config
+from core.config.models.telethon import TelethonSessionConfig
 from telethon import TelegramClient
 
 telethon_cfg = main_config.telethon
 
 
 class TelethonClient:
-    def __init__(self):
-        self.client = TelegramClient(telethon_cfg.session_name, telethon_cfg.api_id, telethon_cfg.api_hash)
+    def __init__(self, session_cfg: TelethonSessionConfig):
+        self.session_cfg = session_cfg
+        self.session_name = session_cfg.session_name
+        self.client = TelegramClient(session_cfg.session_name, session_cfg.api_id, session_cfg.api_hash)
+        # Момент (по часам event loop), до которого аккаунт ждёт окончания FloodWait
+        self.flood_wait_until: float = 0.0
 
     async def connect(self):
-        await self.client.start(phone=telethon_cfg.phone_number)
-        print("Telethon client connected as user")
+        await self.client.start(phone=self.session_cfg.phone_number)
+        print(f"Telethon client {self.session_name} connected as user")
 
     async def disconnect(self):
         await self.client.disconnect()
-        print("Telethon client disconnected")
+        print(f"Telethon client {self.session_name} disconnected")
 
     async def get_entity_safe(self, channel_link: str):
         try:
@@ -25,9 +34,58 @@ class TelethonClient:
             return None
 
 
-client_instance = TelethonClient()
+class TelethonClientPool:
+    """
+    Пул аккаунтов Telethon. Каждый канал закреплён за аккаунтом через rendezvous-хэширование,
+    поэтому кэш сущностей аккаунта остаётся «тёплым», а при добавлении аккаунта переезжает
+    лишь небольшая доля каналов. Аккаунт, получивший FloodWait, пропускается до окончания ожидания.
+    """
+
+    def __init__(self, sessions: List[TelethonSessionConfig]):
+        self.clients = [TelethonClient(session_cfg) for session_cfg in sessions]
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    async def connect(self):
+        for client in self.clients:
+            await client.connect()
+
+    async def disconnect(self):
+        for client in self.clients:
+            await client.disconnect()
+
+    def clients_for(self, channel_link: str) -> List[TelethonClient]:
+        """Аккаунты в порядке предпочтения для канала."""
+        return sorted(self.clients, key=lambda client: self._rank(client.session_name, channel_link), reverse=True)
+
+    def get_client(self, channel_link: str) -> TelethonClient:
+        """Первый по предпочтению аккаунт без FloodWait, иначе тот, что освободится раньше всех."""
+        now = asyncio.get_running_loop().time()
+        candidates = self.clients_for(channel_link)
+        for client in candidates:
+            if client.flood_wait_until <= now:
+                return client
+        return min(candidates, key=lambda client: client.flood_wait_until)
+
+    def wait_time(self, channel_link: str) -> float:
+        """Сколько секунд ждать, пока для канала освободится хотя бы один аккаунт."""
+        now = asyncio.get_running_loop().time()
+        return max(self.get_client(channel_link).flood_wait_until - now, 0.0)
+
+    def report_flood_wait(self, client: TelethonClient, seconds: int) -> None:
+        now = asyncio.get_running_loop().time()
+        client.flood_wait_until = max(client.flood_wait_until, now + seconds)
+
+    @staticmethod
+    def _rank(session_name: str, channel_link: str) -> int:
+        digest = hashlib.blake2b(f"{session_name}:{channel_link}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+
+client_pool = TelethonClientPool(telethon_cfg.sessions)
 
 
 # Dependency
-async def get_telethon_client():
-    return client_instance.client
+async def get_telethon_pool():
+    return client_pool
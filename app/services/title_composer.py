@@ -1,32 +1,135 @@
+import asyncio
+import re
+from typing import Dict, List
+
 from core.config import main_config
+from core.config.models.summarizer import SummarizerConfig
 from langchain_community.chat_models.gigachat import GigaChat
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+SYSTEM_PROMPT = (
+    "На входе — список телеграм-постов на любую тему (политика, финансы, ИИ, и т.д.). "
+    "Для каждого поста сформируйте однопредложное и максимально точное описание, которое:\n\n"
+    "1. Отражает уникальный инфоповод или ключевую мысль, упомянутую именно в данном тексте.\n"
+    "2. Чётко отличает этот пост от других (даже на смежные темы), избегая общей переформулировки.\n"
+    "3. Может включать вкрапления английских терминов (если релевантно тематике), "
+    "но остаётся в целом на русском языке.\n"
+    "4. Исключает избыточную детализацию — упоминайте только главное (что за технология, законопроект, "
+    "событие, результат и т.д.)."
+)
+
+BATCH_FORMAT_PROMPT = (
+    "\n\nПосты пронумерованы в формате «[N] текст поста». "
+    "Ответ верните строго в виде строк «N. описание» — по одной строке на каждый пост, "
+    "в том же порядке и без какого-либо дополнительного текста."
+)
+
+# Строка ответа вида «3. описание», «[3] описание» или «3) описание». Номер без скобок или точки не считается
+# маркером: так начинаются и строки-продолжения («2 млн просмотров…»), и дроби («2.5 млн») без пробела после точки
+BATCH_LINE_PATTERN = re.compile(r"^\s*(?:\[(\d+)\]\s*|(\d+)[.)]\s+)[:\-—]?\s*(.+?)\s*$")
 
 
 class GigaSummarizer:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, config: SummarizerConfig):
         self.chat_model = GigaChat(credentials=api_key, model="GigaChat", timeout=30, verify_ssl_certs=False)
+        self.config = config
+        # Общий для всех каналов лимит одновременных запросов к GigaChat
+        self._semaphore = asyncio.Semaphore(config.max_concurrency)
 
     def summarize(self, text: str) -> str:
-        from langchain_core.messages import HumanMessage, SystemMessage
-
-        messages = [
-            SystemMessage(
-                content=(
-                    "На входе — список телеграм-постов на любую тему (политика, финансы, ИИ, и т.д.). "
-                    "Для каждого поста сформируйте однопредложное и максимально точное описание, которое:\n\n"
-                    "1. Отражает уникальный инфоповод или ключевую мысль, упомянутую именно в данном тексте.\n"
-                    "2. Чётко отличает этот пост от других (даже на смежные темы), избегая общей переформулировки.\n"
-                    "3. Может включать вкрапления английских терминов (если релевантно тематике), "
-                    "но остаётся в целом на русском языке.\n"
-                    "4. Исключает избыточную детализацию — упоминайте только главное (что за технология, законопроект, "
-                    "событие, результат и т.д.)."
-                ),
-            ),
-            HumanMessage(content=text),
-        ]
-        response = self.chat_model.invoke(messages)
+        response = self.chat_model.invoke(self._single_messages(text))
         return response.content
 
+    async def asummarize(self, text: str) -> str:
+        async with self._semaphore:
+            response = await self.chat_model.ainvoke(self._single_messages(text))
+        return response.content
+
+    def summarize_batch(self, texts: List[str]) -> List[str]:
+        """
+        Суммаризирует несколько постов, упаковывая их в общие запросы.
+        Посты, для которых не удалось разобрать ответ, суммаризируются по одному.
+        """
+        titles: List[str] = []
+        for batch in self._split_batches(texts):
+            if len(batch) == 1:
+                titles.append(self.summarize(batch[0]))
+                continue
+            response = self.chat_model.invoke(self._batch_messages(batch))
+            parsed = self._parse_batch_response(response.content, len(batch))
+            titles.extend(parsed.get(idx) or self.summarize(text) for idx, text in enumerate(batch))
+        return titles
+
+    async def asummarize_batch(self, texts: List[str]) -> List[str]:
+        """
+        Асинхронный вариант summarize_batch: пачки обрабатываются параллельно,
+        не более max_concurrency запросов одновременно.
+        """
+        batches = self._split_batches(texts)
+        results = await asyncio.gather(*(self._asummarize_one_batch(batch) for batch in batches))
+        return [title for batch_titles in results for title in batch_titles]
+
+    async def _asummarize_one_batch(self, batch: List[str]) -> List[str]:
+        if len(batch) == 1:
+            return [await self.asummarize(batch[0])]
+
+        async with self._semaphore:
+            response = await self.chat_model.ainvoke(self._batch_messages(batch))
+        parsed = self._parse_batch_response(response.content, len(batch))
+
+        missing = [idx for idx in range(len(batch)) if not parsed.get(idx)]
+        if missing:
+            fallback_titles = await asyncio.gather(*(self.asummarize(batch[idx]) for idx in missing))
+            parsed.update(zip(missing, fallback_titles))
+        return [parsed[idx] for idx in range(len(batch))]
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_chars = 0
+        for text in texts:
+            if current and (
+                len(current) >= self.config.batch_size or current_chars + len(text) > self.config.max_batch_chars
+            ):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(text)
+            current_chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _single_messages(text: str) -> List[BaseMessage]:
+        return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=text)]
+
+    @staticmethod
+    def _batch_messages(texts: List[str]) -> List[BaseMessage]:
+        numbered_posts = "\n\n".join(f"[{idx}] {text}" for idx, text in enumerate(texts, start=1))
+        return [SystemMessage(content=SYSTEM_PROMPT + BATCH_FORMAT_PROMPT), HumanMessage(content=numbered_posts)]
+
+    @staticmethod
+    def _parse_batch_response(content: str, batch_len: int) -> Dict[int, str]:
+        """
+        Возвращает заголовки по индексу поста в пачке (с нуля).
+        Строки без маркера номера и с номерами вне пачки игнорируются. Номер, встретившийся дважды,
+        в результат не попадает: какая из строк — заголовок, неизвестно, и пост суммаризируется отдельно.
+        """
+        titles: Dict[int, str] = {}
+        repeated = set()
+        for line in content.splitlines():
+            match = BATCH_LINE_PATTERN.match(line)
+            if not match:
+                continue
+            idx = int(match.group(1) or match.group(2)) - 1
+            if not 0 <= idx < batch_len:
+                continue
+            if idx in titles:
+                repeated.add(idx)
+            else:
+                titles[idx] = match.group(3)
+        return {idx: title for idx, title in titles.items() if idx not in repeated}
+
 
 # Example usage
-summarizer = GigaSummarizer(api_key=main_config.giga_key)
+summarizer = GigaSummarizer(api_key=main_config.giga_key, config=main_config.summarizer)
@@ -0,0 +1,48 @@
+"""
+Отдельный воркер ежедневного запуска без HTTP API.
+Любое число воркеров (и процессов uvicorn) делят каналы запуска через очередь в Postgres:
+
+    cd app && python worker.py --once   # в нескольких терминалах
+
+У каждого воркера должны быть свои сессии Telethon (TELETHON_SESSIONS): файл сессии нельзя
+использовать из нескольких процессов одновременно.
+"""
+
+import argparse
+import asyncio
+
+
+async def main(once: bool) -> None:
+    # Процессы compute_pool (spawn) импортируют этот модуль заново как __mp_main__, поэтому модули
+    # с клиентами Telethon (файлы сессий) и GigaChat импортируются только в самом воркере
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from core.config.config_loader import main_config
+    from database.db_session_maker import close_db_connection, initialize_database
+    from services.compute_pool import compute_pool
+    from services.daily_post_handler import DailyPostHandler
+    from services.telethon_client import client_pool
+
+    await client_pool.connect()
+    await initialize_database()
+    daily_post_handler = DailyPostHandler(client_pool, config=main_config.daily_post_handler)
+    try:
+        await daily_post_handler.run_daily_tasks()
+        if once:
+            return
+
+        scheduler = AsyncIOScheduler()
+        daily_post_handler.add_scheduled_jobs(scheduler)
+        scheduler.start()
+        print(f"Worker {daily_post_handler.worker_id} scheduled daily tasks")
+        await asyncio.Event().wait()
+    finally:
+        await client_pool.disconnect()
+        await close_db_connection()
+        compute_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily ingestion worker")
+    parser.add_argument("--once", action="store_true", help="Join the current daily run and exit")
+    args = parser.parse_args()
+    asyncio.run(main(args.once))
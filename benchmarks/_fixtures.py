@@ -0,0 +1,24 @@
+"""
+Общие данные для бенчмарков. Импортируется после sys.path.insert(0, os.getcwd()) в скрипте бенчмарка.
+"""
+
+from datetime import datetime, timezone
+
+from models.post import EMBEDDING_DIM
+
+
+def make_rows(channel_link: str, count: int, text_length: int = 400) -> list[dict]:
+    # Строки постов в формате upsert_posts с одинаковым текстом длины text_length
+    return [
+        {
+            "post_link": f"t.me/{channel_link}/{idx}",
+            "channel_link": channel_link,
+            "text": "x" * text_length,
+            "title": f"Benchmark post {idx}",
+            "embedding": [0.001 * (idx % 1000)] * EMBEDDING_DIM,
+            "amount_reactions": idx % 100,
+            "amount_comments": idx % 10,
+            "published_at": datetime.now(timezone.utc),
+        }
+        for idx in range(count)
+    ]
@@ -0,0 +1,124 @@
+"""
+Сравнение прежней построчной модели данных агрегатора с колоночной PostFrame.
+Прежний вариант: словарь на пост с эмбеддингом списком float (как его отдавала колонка ARRAY(Float)),
+матрица для кластеризации через np.array по списку и оценка важности циклом по постам.
+Новый вариант: PostFrame с матрицей float32 и векторами метрик, оценка — операции над целыми массивами.
+Для обоих вариантов выводятся время и пик памяти Python (tracemalloc); кластеризация не замеряется,
+метки кластеров одинаковые и случайные. База не нужна.
+
+Запуск из каталога app:
+    cd app && python ../benchmarks/bench_aggregator_scoring.py --rows 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.getcwd())
+
+import numpy as np  # noqa: E402
+from models.post import EMBEDDING_DIM  # noqa: E402
+from services.aggregator import Aggregator, PostFrame  # noqa: E402
+
+
+def make_inputs(count: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    started = datetime.now(timezone.utc) - timedelta(days=30)
+    return {
+        "post_links": [f"t.me/bench/{idx}" for idx in range(count)],
+        "embeddings": rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32),
+        "reactions": rng.integers(0, 1000, count),
+        "comments": rng.integers(0, 100, count),
+        "subscribers": rng.integers(0, 100000, count),
+        "published_at": [started + timedelta(seconds=int(offset)) for offset in rng.integers(0, 30 * 86400, count)],
+        "cluster_labels": rng.integers(0, count // 3, count),
+    }
+
+
+def score_rows(inputs: dict) -> list[float]:
+    # Прежняя модель данных: словарь на пост и цикл по постам
+    all_posts = [
+        {
+            "post_link": post_link,
+            "embedding": embedding,
+            "reactions": int(reactions),
+            "comments": int(comments),
+            "publication_date": published_at,
+            "subscribers": int(subscribers),
+            "cluster_label": int(cluster_label),
+        }
+        for post_link, embedding, reactions, comments, subscribers, published_at, cluster_label in zip(
+            inputs["post_links"],
+            inputs["embeddings"].tolist(),
+            inputs["reactions"],
+            inputs["comments"],
+            inputs["subscribers"],
+            inputs["published_at"],
+            inputs["cluster_labels"],
+        )
+    ]
+    np.array([post_data["embedding"] for post_data in all_posts]).reshape(-1, EMBEDDING_DIM)
+
+    cluster_counts = Counter(post_data["cluster_label"] for post_data in all_posts)
+    publication_dates = [post_data["publication_date"] for post_data in all_posts]
+    earliest_publication_date = min(publication_dates)
+    total_time_range = (max(publication_dates) - earliest_publication_date).total_seconds() or 1
+    cluster_importances, engagement_scores, recency_scores = [], [], []
+    for post_data in all_posts:
+        cluster_importances.append(cluster_counts[post_data["cluster_label"]])
+        engagement_norm = np.log1p(post_data["reactions"] + post_data["comments"])
+        subscribers_norm = np.log1p(post_data["subscribers"])
+        engagement_scores.append(engagement_norm / subscribers_norm if subscribers_norm > 0 else 0)
+        recency_seconds = (post_data["publication_date"] - earliest_publication_date).total_seconds()
+        recency_scores.append(recency_seconds / total_time_range)
+
+    aggregator = Aggregator(session=None)
+    cluster_norm = aggregator._normalize_metric(cluster_importances)
+    engagement_norm = aggregator._normalize_metric(engagement_scores)
+    recency_norm = aggregator._normalize_metric(recency_scores)
+    return [(cluster_norm[idx] + engagement_norm[idx] + recency_norm[idx]) / 3 for idx in range(len(all_posts))]
+
+
+def score_frame(inputs: dict) -> np.ndarray:
+    posts = PostFrame(
+        post_links=inputs["post_links"],
+        embeddings=inputs["embeddings"],
+        channel_codes=np.zeros(len(inputs["post_links"]), dtype=np.int64),
+        channels=["bench"],
+        reactions=inputs["reactions"],
+        comments=inputs["comments"],
+        subscribers=inputs["subscribers"],
+        published_at=np.fromiter((value.timestamp() for value in inputs["published_at"]), dtype=np.float64),
+        cluster_labels=inputs["cluster_labels"],
+    )
+    Aggregator(session=None)._calculate_importance_scores(posts)
+    return posts.importance_scores
+
+
+def measure(name: str, score, inputs: dict):
+    tracemalloc.start()
+    started = time.perf_counter()
+    scores = score(inputs)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>10}: {elapsed:7.2f}s, peak memory {peak / 2**20:8.1f} MB")
+    return np.asarray(scores)
+
+
+def main(rows_count: int) -> None:
+    inputs = make_inputs(rows_count)
+    row_scores = measure("dicts", score_rows, inputs)
+    frame_scores = measure("PostFrame", score_frame, inputs)
+    print(f"Max score difference: {np.abs(row_scores - frame_scores).max():.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.rows)
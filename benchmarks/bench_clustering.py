@@ -0,0 +1,92 @@
+"""
+Сравнение бэкендов кластеризации агрегатора: точной agglomerative (scikit-learn) и knn_graph (граф соседей faiss).
+На --rows постах выводятся время обоих бэкендов и согласованность их меток (adjusted Rand index);
+на --scale-rows постах замеряется только knn_graph — agglomerative на таком объёме не помещается в память.
+
+Эмбеддинги по умолчанию синтетические: кластеры разного размера вокруг случайных центров, с разбросом --noise.
+С --from-db берутся эмбеддинги постов из базы (тот же .env, что и у сервиса).
+
+Запуск из каталога app:
+    cd app && python ../benchmarks/bench_clustering.py --rows 5000 --scale-rows 200000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import numpy as np  # noqa: E402
+from core.config import main_config  # noqa: E402
+from crud.post import get_post_embeddings  # noqa: E402
+from database.db_session_maker import database, initialize_database  # noqa: E402
+from models.post import EMBEDDING_DIM  # noqa: E402
+from services.clustering import cluster_embeddings  # noqa: E402
+from sklearn.metrics import adjusted_rand_score  # noqa: E402
+
+
+def make_embeddings(count: int, noise: float, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    # Размеры кластеров с тяжёлым хвостом: много одиночных постов и несколько крупных сюжетов
+    sizes = []
+    while sum(sizes) < count:
+        sizes.append(int(min(rng.pareto(1.2) + 1, 200)))
+    labels = np.repeat(np.arange(len(sizes)), sizes)[:count]
+    centers = rng.standard_normal((len(sizes), EMBEDDING_DIM)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    scale = noise / np.sqrt(EMBEDDING_DIM)
+    embeddings = centers[labels] + rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32) * scale
+    return embeddings, labels
+
+
+async def load_embeddings(count: int) -> np.ndarray:
+    await initialize_database()
+    async with database.get_session() as session:
+        _, embeddings = await get_post_embeddings(session)
+    await database.close()
+    return embeddings[:count]
+
+
+def run_backend(backend: str, embeddings: np.ndarray) -> np.ndarray:
+    config = main_config.clustering.model_copy(update={"backend": backend})
+    started = time.perf_counter()
+    labels = cluster_embeddings(embeddings, config)
+    elapsed = time.perf_counter() - started
+    print(f"{backend:>14}: {len(embeddings)} posts, {elapsed:7.2f}s, {labels.max() + 1} clusters")
+    return labels
+
+
+def main(rows_count: int, scale_rows_count: int, noise: float, from_db: bool) -> None:
+    if from_db:
+        embeddings = asyncio.run(load_embeddings(max(rows_count, scale_rows_count)))
+        true_labels = None
+    else:
+        embeddings, true_labels = make_embeddings(max(rows_count, scale_rows_count), noise)
+
+    print("Agreement:")
+    sample = embeddings[:rows_count]
+    exact_labels = run_backend("agglomerative", sample)
+    approximate_labels = run_backend("knn_graph", sample)
+    print(f"ARI knn_graph vs agglomerative: {adjusted_rand_score(exact_labels, approximate_labels):.4f}")
+    if true_labels is not None:
+        print(f"ARI agglomerative vs generated: {adjusted_rand_score(true_labels[:rows_count], exact_labels):.4f}")
+
+    if scale_rows_count > rows_count and len(embeddings) > rows_count:
+        print("Scale:")
+        scale_labels = run_backend("knn_graph", embeddings[:scale_rows_count])
+        if true_labels is not None:
+            score = adjusted_rand_score(true_labels[:scale_rows_count], scale_labels)
+            print(f"ARI knn_graph vs generated: {score:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--scale-rows", type=int, default=200000)
+    # Разброс 0.34 даёт внутрикластерное косинусное расстояние около 0.1 — у самого порога 0.11
+    parser.add_argument("--noise", type=float, default=0.34)
+    parser.add_argument("--from-db", action="store_true")
+    args = parser.parse_args()
+    main(args.rows, args.scale_rows, args.noise, args.from_db)
@@ -0,0 +1,81 @@
+"""
+Задержка event loop во время кластеризации: в том же процессе и в процессе compute_pool.
+Пока идёт кластеризация, корутина каждые 10 мс засыпает и замеряет, насколько позже она проснулась, —
+так же задерживаются ответы API. Выводятся p50, p99 и максимум задержки. База не нужна.
+
+Запуск из каталога app:
+    cd app && python ../benchmarks/bench_event_loop_lag.py --rows 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import numpy as np  # noqa: E402
+from core.config import main_config  # noqa: E402
+from models.post import EMBEDDING_DIM  # noqa: E402
+from services.clustering import cluster_embeddings, cluster_shared_posts  # noqa: E402
+from services.compute_pool import compute_pool, shared_array  # noqa: E402
+
+TICK_SECONDS = 0.01
+
+
+async def measure_lag(lags: list) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def measure(name: str, work) -> None:
+    lags = []
+    ticker = asyncio.create_task(measure_lag(lags))
+    await asyncio.sleep(TICK_SECONDS)
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(TICK_SECONDS * 2)
+    ticker.cancel()
+    lags_ms = np.array(lags) * 1000
+    print(
+        f"{name:>12}: {elapsed:6.2f}s, loop lag p50 {np.percentile(lags_ms, 50):7.1f} ms, "
+        f"p99 {np.percentile(lags_ms, 99):7.1f} ms, max {lags_ms.max():7.1f} ms"
+    )
+
+
+async def main(rows_count: int) -> None:
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((rows_count, EMBEDDING_DIM)).astype(np.float32)
+    new_posts = np.full(rows_count, -1, dtype=np.int64)
+
+    async def inline() -> None:
+        cluster_embeddings(embeddings, main_config.clustering)
+
+    async def in_pool() -> None:
+        with shared_array(embeddings) as shared_embeddings:
+            await compute_pool.run(
+                cluster_shared_posts,
+                shared_embeddings,
+                new_posts,
+                main_config.clustering,
+                False,
+                main_config.reduction,
+                0,
+            )
+
+    # Первый вызов пула запускает процесс; замер начинается со второго
+    await in_pool()
+    await measure("inline", inline)
+    await measure("compute_pool", in_pool)
+    compute_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
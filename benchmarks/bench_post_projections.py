@@ -0,0 +1,100 @@
+"""
+Сравнение загрузки полных строк постов (get_all_posts) с проекциями, которые использует ежедневный запуск:
+get_post_metrics + get_post_embeddings для агрегатора и get_post_links_by_channel для проверки известных постов.
+Для каждого варианта выводятся время, пик памяти Python (tracemalloc) и объём данных, отданных Postgres.
+
+Запуск из каталога app, с тем же .env, что и у сервиса:
+    cd app && python ../benchmarks/bench_post_projections.py --rows 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.getcwd())
+
+from _fixtures import make_rows  # noqa: E402
+from crud.post import (  # noqa: E402
+    get_all_posts,
+    get_post_embeddings,
+    get_post_links_by_channel,
+    get_post_metrics,
+    get_posts_by_channel,
+    upsert_posts,
+)
+from database.db_session_maker import database, initialize_database  # noqa: E402
+from models.channel import Channel  # noqa: E402
+from models.post import Post  # noqa: E402
+from sqlalchemy import delete, func, select  # noqa: E402
+
+
+async def column_bytes(columns: list) -> int:
+    # Размер значений выбранных колонок на стороне Postgres — оценка трафика к приложению
+    async with database.get_session() as session:
+        total = sum(func.coalesce(func.sum(func.pg_column_size(column)), 0) for column in columns)
+        return int(await session.scalar(select(total)))
+
+
+async def load_projections(session) -> None:
+    await get_post_metrics(session)
+    await get_post_embeddings(session)
+
+
+async def measure(name: str, load) -> None:
+    async with database.get_session() as session:
+        tracemalloc.start()
+        started = time.perf_counter()
+        await load(session)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{name:>36}: {elapsed:6.2f}s, peak memory {peak / 2**20:8.1f} MB")
+
+
+async def main(rows_count: int) -> None:
+    await initialize_database()
+    channel_link = f"bench_{uuid.uuid4().hex[:8]}"
+    async with database.get_session() as session:
+        session.add(Channel(channel_link=channel_link, subs_cnt=1000))
+        await session.commit()
+        await upsert_posts(session, make_rows(channel_link, rows_count, text_length=1500))
+
+    try:
+        print("Aggregation input:")
+        await measure("get_all_posts (full rows)", get_all_posts)
+        await measure("get_post_metrics + get_post_embeddings", load_projections)
+        print("Known post links of a channel:")
+        await measure("get_posts_by_channel (full rows)", lambda session: get_posts_by_channel(session, channel_link))
+        await measure("get_post_links_by_channel", lambda session: get_post_links_by_channel(session, channel_link))
+
+        all_columns = list(Post.__table__.columns)
+        projected_columns = [
+            Post.post_link,
+            Post.amount_reactions,
+            Post.amount_comments,
+            Post.published_at,
+            Post.embedding,
+        ]
+        full_bytes = await column_bytes(all_columns)
+        projected_bytes = await column_bytes(projected_columns)
+        print(
+            f"Data sent by Postgres for aggregation: {full_bytes / 2**20:.1f} MB full rows, "
+            f"{projected_bytes / 2**20:.1f} MB projected ({full_bytes / max(projected_bytes, 1):.1f}x less)"
+        )
+    finally:
+        async with database.get_session() as session:
+            await session.execute(delete(Post).where(Post.channel_link == channel_link))
+            await session.execute(delete(Channel).where(Channel.channel_link == channel_link))
+            await session.commit()
+    await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
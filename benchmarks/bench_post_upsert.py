@@ -0,0 +1,66 @@
+"""
+Сравнение построчной записи постов (create_post) с массовой (upsert_posts).
+
+Запуск из каталога app, с тем же .env, что и у сервиса:
+    cd app && python ../benchmarks/bench_post_upsert.py --rows 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.getcwd())
+
+from _fixtures import make_rows  # noqa: E402
+from crud.post import create_post, upsert_posts  # noqa: E402
+from database.db_session_maker import database, initialize_database  # noqa: E402
+from models.channel import Channel  # noqa: E402
+from models.post import Post  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+
+async def bench_create_post(channel_link: str, rows: list[dict]) -> float:
+    async with database.get_session() as session:
+        started = time.perf_counter()
+        for row in rows:
+            await create_post(session=session, **row)
+        return time.perf_counter() - started
+
+
+async def bench_upsert_posts(channel_link: str, rows: list[dict]) -> float:
+    async with database.get_session() as session:
+        started = time.perf_counter()
+        await upsert_posts(session, rows)
+        return time.perf_counter() - started
+
+
+async def main(rows_count: int) -> None:
+    await initialize_database()
+    results = {}
+    for name, bench in (("create_post", bench_create_post), ("upsert_posts", bench_upsert_posts)):
+        channel_link = f"bench_{uuid.uuid4().hex[:8]}"
+        async with database.get_session() as session:
+            session.add(Channel(channel_link=channel_link, subs_cnt=0))
+            await session.commit()
+        try:
+            elapsed = await bench(channel_link, make_rows(channel_link, rows_count))
+            results[name] = rows_count / elapsed
+            print(f"{name:>13}: {rows_count} rows in {elapsed:.2f}s, {results[name]:.0f} rows/s")
+        finally:
+            async with database.get_session() as session:
+                await session.execute(delete(Post).where(Post.channel_link == channel_link))
+                await session.execute(delete(Channel).where(Channel.channel_link == channel_link))
+                await session.commit()
+
+    print(f"Speedup: {results['upsert_posts'] / results['create_post']:.1f}x")
+    await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
@@ -0,0 +1,104 @@
+"""
+Понижение размерности эмбеддингов (services.reduction) для кластеризации и поиска.
+Для каждой размерности и метода выводятся доля сохранённой энергии, recall@k поиска по сжатым векторам,
+память faiss-индекса и задержка поиска, а также время кластеризации и её согласованность
+(adjusted Rand index) с кластеризацией полных векторов.
+
+Эмбеддинги по умолчанию синтетические, как в bench_clustering.py; с --from-db берутся из базы.
+
+Запуск из каталога app:
+    cd app && python ../benchmarks/bench_reduction.py --rows 50000 --dims 128 256
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+from core.config import main_config  # noqa: E402
+from crud.post import get_post_embeddings  # noqa: E402
+from database.db_session_maker import database, initialize_database  # noqa: E402
+from models.post import EMBEDDING_DIM  # noqa: E402
+from services.clustering import cluster_embeddings  # noqa: E402
+from services.reduction import fit_projection, project, search_recall  # noqa: E402
+from sklearn.metrics import adjusted_rand_score  # noqa: E402
+
+
+def make_embeddings(count: int, noise: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sizes = []
+    while sum(sizes) < count:
+        sizes.append(int(min(rng.pareto(1.2) + 1, 200)))
+    labels = np.repeat(np.arange(len(sizes)), sizes)[:count]
+    # Центры кластеров лежат в подпространстве меньшей размерности, как у реальных текстовых эмбеддингов
+    basis = np.linalg.qr(rng.standard_normal((EMBEDDING_DIM, 192)))[0].T
+    centers = (rng.standard_normal((len(sizes), 192)) @ basis).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    scale = noise / np.sqrt(EMBEDDING_DIM)
+    return centers[labels] + rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32) * scale
+
+
+async def load_embeddings(count: int) -> np.ndarray:
+    await initialize_database()
+    async with database.get_session() as session:
+        _, embeddings = await get_post_embeddings(session)
+    await database.close()
+    return embeddings[:count]
+
+
+def search_latency_ms(vectors: np.ndarray, queries: int = 200) -> float:
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    started = time.perf_counter()
+    for row in vectors[:queries]:
+        index.search(row.reshape(1, -1), 10)
+    return (time.perf_counter() - started) / queries * 1000
+
+
+def main(rows_count: int, cluster_rows_count: int, dims: list[int], noise: float, from_db: bool) -> None:
+    if from_db:
+        embeddings = asyncio.run(load_embeddings(rows_count))
+    else:
+        embeddings = make_embeddings(rows_count, noise)
+    cluster_sample = embeddings[:cluster_rows_count]
+
+    started = time.perf_counter()
+    full_labels = cluster_embeddings(cluster_sample, main_config.clustering)
+    full_cluster_seconds = time.perf_counter() - started
+    print(
+        f"{'full':>6} {embeddings.shape[1]:>5}d: index {embeddings.nbytes / 2**20:7.1f} MB, "
+        f"search {search_latency_ms(embeddings):6.2f} ms, clustering {full_cluster_seconds:6.2f}s"
+    )
+
+    for method in ("pca", "random"):
+        for dim in dims:
+            config = main_config.reduction.model_copy(update={"enabled": True, "method": method, "dim": dim})
+            projection, retained = fit_projection(embeddings, config)
+            reduced = project(embeddings, projection)
+            recall = search_recall(embeddings, reduced, config)
+
+            started = time.perf_counter()
+            labels = cluster_embeddings(project(cluster_sample, projection), main_config.clustering)
+            cluster_seconds = time.perf_counter() - started
+            print(
+                f"{method:>6} {dim:>5}d: index {reduced.nbytes / 2**20:7.1f} MB, "
+                f"search {search_latency_ms(reduced):6.2f} ms, clustering {cluster_seconds:6.2f}s, "
+                f"retained energy {retained:.3f}, recall@{config.recall_k} {recall:.3f}, "
+                f"ARI vs full {adjusted_rand_score(full_labels, labels):.4f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--cluster-rows", type=int, default=20000)
+    parser.add_argument("--dims", type=int, nargs="+", default=[128, 256])
+    parser.add_argument("--noise", type=float, default=0.34)
+    parser.add_argument("--from-db", action="store_true")
+    args = parser.parse_args()
+    main(args.rows, args.cluster_rows, args.dims, args.noise, args.from_db)
@@ -8,7 +8,8 @@ async def main():
     phone_number = input("Enter your phone number: ")
     api_id = input("Enter your API ID: ")
     api_hash = input("Enter your API hash: ")
-    session_name = "fastapi_telethon_session"
+    # Для пула аккаунтов (TELETHON_SESSIONS) сессия создаётся для каждого аккаунта под своим именем
+    session_name = input("Enter session name [fastapi_telethon_session]: ") or "fastapi_telethon_session"
 
     client = TelegramClient(session_name, api_id, api_hash)
     await client.start(phone=phone_number)